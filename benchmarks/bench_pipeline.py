@@ -0,0 +1,172 @@
+'''
+Benchmarks for the scrape-and-parse pipeline, run against fixtures instead of
+the live site so results are repeatable. Each benchmark reports its best and
+median wall time, peak memory (from a separate tracemalloc run), and
+throughput in rows (or calls) per second.
+
+Run from the repository's root:
+
+    python benchmarks/bench_pipeline.py                   # report only
+    python benchmarks/bench_pipeline.py --save base.json  # record a baseline
+    python benchmarks/bench_pipeline.py --compare base.json
+
+With --compare, the script exits with status 1 if any benchmark's best time
+is more than --tolerance slower than the baseline's, so it can gate upgrades
+of pandas, lxml, etc.
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixtures  # noqa: E402
+from benchmarks.standin_server import StandInServer  # noqa: E402
+from construct_query import ConstructURL, DownloadStats  # noqa: E402
+from validate_attrs import ValidateURLAttrs  # noqa: E402
+
+# attrs that can be encoded without looking up names on the site
+ATTRS = [
+    ('ATP', {}),
+    ('WTA', {'surface': ['clay', 'carpet'], 'level': 'premier',
+             'vs hand': 'left', 'as rank': 'Top 5',
+             'round': ['R16', 'Round of 32']}),
+    ('ATP', {'vs height': 'Shorter', 'vs entry': ['wild card', 'seeded'],
+             'as entry': 'seeded', 'vs current rank': 'inactive',
+             'vs rank': (14, 112), 'sets': ['straights', '4 of 5 sets'],
+             'score': 'all 7-6'}),
+    ('WTA', {'event': ['cincinnati', 'canada', 'rome'], 'sets': '2 of 3 sets',
+             'vs rank': 'Top 5'}),
+]
+NAMES = ['RogerFederer', 'JuanMartinDelPotro', 'SerenaWilliams',
+         'JoWilfriedTsonga', 'BiancaAndreescu'] * 200
+
+
+def measure(func, repeat):
+    '''
+    Time `repeat` calls of `func`, then call it once more while tracing
+    memory allocations to find its peak usage.
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'best': min(times), 'median': statistics.median(times),
+            'peak_mb': peak / 1024**2}
+
+
+def collect_benchmarks(quick=False):
+    '''
+    Return a dict of benchmark name -> (function, rows per call).
+    '''
+    benches = {}
+    merge = DownloadStats.merge_and_edit_tables
+
+    sizes = [sz for sz in fixtures.SIZES if not (quick and sz.endswith('10k'))]
+    all_fixtures = {f"{sz}-{tr}": fixtures.make_fixture(sz, tr)
+                    for sz in sizes for tr in ['ATP', 'WTA']}
+    all_fixtures.update({f"recorded-{nm}": fx
+                         for nm, fx in fixtures.load_recorded().items()})
+
+    for name, fx in all_fixtures.items():
+        benches[f"merge_and_edit_tables[{name}]"] = (
+            lambda fx=fx: merge(fx['html_tables']), fx['rows'])
+
+    val_obj = ValidateURLAttrs()
+    benches['_validate_attrs'] = (
+        lambda: [val_obj._validate_attrs(tour=tr, **attrs)
+                 for _ in range(250) for tr, attrs in ATTRS],
+        250 * len(ATTRS))
+
+    benches['spaced_name_str'] = (
+        lambda: [ConstructURL.spaced_name_str(nm) for nm in NAMES], len(NAMES))
+
+    return benches
+
+
+def run_end_to_end(repeat):
+    '''
+    Time a full DownloadStats() query (plain-HTTP backend, no cache) for a
+    career-length ATP player on the local stand-in server. (The stand-in's
+    pages, not the live site's, so this tracks the package's own overhead.)
+    '''
+    rows = fixtures.SIZES['career']
+    with StandInServer(n_matches=rows) as server:
+        url = (server.home_url
+               + 'cgi-bin/player-classic.cgi?p=RogerFederer&f=ACareerqq')
+        res = measure(lambda: DownloadStats(url=url, backend='http',
+                                            cache=False), repeat)
+
+    return res, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed runs per benchmark [default: 5]')
+    parser.add_argument('--quick', action='store_true',
+                        help='skip the 10k-row fixtures')
+    parser.add_argument('--only', default='',
+                        help='only run benchmarks whose names contain this')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare',
+                        help='baseline JSON file to check against')
+    parser.add_argument('--tolerance', type=float, default=.2,
+                        help='allowed slowdown vs. baseline [default: 0.2]')
+    args = parser.parse_args()
+
+    # pandas deprecation warnings would drown out the report
+    warnings.simplefilter('ignore')
+
+    benches = collect_benchmarks(args.quick)
+    results = {}
+
+    for name, (func, rows) in benches.items():
+        if args.only in name:
+            results[name] = measure(func, args.repeat)
+            results[name]['rows'] = rows
+
+    if args.only in 'DownloadStats[end-to-end]':
+        res, rows = run_end_to_end(args.repeat)
+        results['DownloadStats[end-to-end]'] = dict(res, rows=rows)
+
+    print(f"{'benchmark':<44}{'rows':>7}{'best ms':>10}{'median ms':>11}"
+          f"{'peak MB':>9}{'rows/s':>11}")
+    for name, res in results.items():
+        res['rows_per_sec'] = res['rows'] / res['best']
+        print(f"{name:<44}{res['rows']:>7}{res['best'] * 1e3:>10.1f}"
+              f"{res['median'] * 1e3:>11.1f}{res['peak_mb']:>9.1f}"
+              f"{res['rows_per_sec']:>11.0f}")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        regressions = [nm for nm, res in results.items() if nm in baseline
+                       and res['best'] > (baseline[nm]['best']
+                                          * (1 + args.tolerance))]
+        for nm in regressions:
+            print(f"REGRESSION: {nm} took {results[nm]['best'] * 1e3:.1f} ms "
+                  f"(baseline {baseline[nm]['best'] * 1e3:.1f} ms)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+'''
+Fixtures for the benchmarks in this folder: the `html_tables` lists and
+titles that QueryData() would retrieve from Tennis Abstract.
+
+Synthetic fixtures are generated deterministically (the same seed always
+gives the same table), with one table per stat view -- three for ATP players
+and two for WTA players -- that match the site's column layout. Recorded
+fixtures are real query results saved with record_fixture() as JSON in the
+`fixtures/` folder beside this file; load_recorded() picks up all of them.
+'''
+import glob
+import json
+import os
+import random
+
+from datetime import date, timedelta
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'fixtures')
+
+# number of matches in each synthetic size
+SIZES = {'small': 25, 'career': 1500, 'synthetic-10k': 10000}
+
+COMMON_COLS = ['Date', 'Tournament', 'Surface', 'Rd', 'Rk', 'vRk', '', 'Score']
+VIEW_COLS = {
+    'ATP': [['DR', 'A%', 'DF%', '1stIn', '1st%', '2nd%', 'BPSvd', 'Time'],
+            ['TPW', 'RPW', 'vA%', 'v1st%', 'v2nd%', 'BPCnv'],
+            ['Pts', 'Aces', 'DFs', 'SvPts']],
+    'WTA': [['DR', 'A%', 'DF%', '1stIn', '1st%', '2nd%', 'BPSvd', 'Time'],
+            ['TPW', 'RPW', 'vA%', 'v1st%', 'v2nd%', 'BPCnv']],
+}
+
+EVENTS = [('Australian Open', 'Hard'), ('Roland Garros', 'Clay'),
+          ('Wimbledon', 'Grass'), ('US Open', 'Hard'), ('Rome', 'Clay'),
+          ('Miami', 'Hard'), ('Washington', 'Hard'), ('Stuttgart', 'Carpet')]
+OPPONENTS = ['Rafael Nadal [ESP]', '(3)Novak Djokovic [SRB]',
+             'Gael Monfils [FRA]', '(WC)Andy Murray [GBR]',
+             'Juan Monaco [ARG]', '(Q)Arnaud Clement [FRA]',
+             '(12)Guillermo Canas [ARG]']
+MONTHS = 'Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec'.split()
+
+
+def _pct(rng):
+    return '-' if rng.random() < .03 else f"{rng.uniform(20, 90):.1f}%"
+
+
+def _break_points(rng):
+    chances = rng.randint(0, 12)
+    if chances == 0:
+        return '- (0/0)'
+    won = rng.randint(0, chances)
+    return f"{100 * won / chances:.1f}% ({won}/{chances})"
+
+
+def make_matches(n_matches, seed=0):
+    '''
+    Return a list of dicts (newest first, as on the site) with a value for
+    every column that appears in any stat view.
+    '''
+    rng = random.Random(seed)
+    day = date(1995, 1, 1)
+    matches = []
+
+    for _ in range(n_matches):
+        day += timedelta(days=rng.randint(0, 3))
+        event, surface = rng.choice(EVENTS)
+        opponent = rng.choice(OPPONENTS)
+        won = rng.random() < .7
+
+        matches.append({
+            # the site uses non-breaking hyphens (U+2011) in dates
+            'Date': f"{day.day:02d}‑{MONTHS[day.month - 1]}‑{day.year}",
+            'Tournament': event, 'Surface': surface,
+            'Rd': rng.choice(['R64', 'R32', 'R16', 'QF', 'SF', 'F']),
+            'Rk': rng.randint(1, 50), 'vRk': rng.randint(1, 300),
+            '': f"d. {opponent}" if won else f"{opponent} d.",
+            'Score': f"6-{rng.randint(0, 4)} 7-6({rng.randint(0, 9)})",
+            'DR': f"{rng.uniform(.5, 2.5):.2f}", 'A%': _pct(rng),
+            'DF%': _pct(rng), '1stIn': _pct(rng), '1st%': _pct(rng),
+            '2nd%': _pct(rng), 'BPSvd': _break_points(rng),
+            'Time': f"{rng.randint(1, 4)}:{rng.randint(0, 59):02d}",
+            'TPW': _pct(rng), 'RPW': _pct(rng), 'vA%': _pct(rng),
+            'v1st%': _pct(rng), 'v2nd%': _pct(rng),
+            'BPCnv': _break_points(rng), 'Pts': rng.randint(40, 200),
+            'Aces': rng.randint(0, 30), 'DFs': rng.randint(0, 10),
+            'SvPts': rng.randint(20, 100)})
+
+    return matches[::-1]
+
+
+def make_table(matches, stat_cols):
+    '''
+    Return the HTML of a `#matches` table for one stat view, including the
+    trailing row with a link that DownloadStats() drops.
+    '''
+    cols = COMMON_COLS + stat_cols
+    head = ''.join(f"<th>{col}</th>" for col in cols)
+    body = ''.join('<tr>' + ''.join(f"<td>{mt[col]}</td>" for col in cols)
+                   + '</tr>' for mt in matches)
+    link = f"<tr><td colspan='{len(cols)}'><a href='#'>More</a></td></tr>"
+
+    return (f"<table id='matches'><thead><tr>{head}</tr></thead>"
+            f"<tbody>{body}{link}</tbody></table>")
+
+
+def make_fixture(size, tour, seed=0):
+    '''
+    Return a synthetic fixture as a dict with 'html_tables', 'title', and
+    'rows' (the number of matches) keys.
+
+    Arguments
+    ---------
+
+    size : str or int, required
+        A key of SIZES or a number of matches.
+
+    tour : str, required
+        'ATP' (three stat views) or 'WTA' (two).
+    '''
+    n_matches = SIZES.get(size, size)
+    matches = make_matches(n_matches, seed)
+    wins = sum(mt[''].startswith('d.') for mt in matches)
+
+    return {'html_tables': [make_table(matches, cols)
+                            for cols in VIEW_COLS[tour]],
+            'title': (f"Matches ({wins}-{n_matches - wins}) > "
+                      "Time Span: Career"),
+            'rows': n_matches}
+
+
+def record_fixture(url, name, browser='chromium'):
+    '''
+    Run a live query with QueryData() and save it as a recorded fixture
+    named `name`: its tables and title, the page's source as the site serves
+    it (for the stand-in server to replay), and a digest of the formatted
+    match data (for test_suite.py to check future versions of pandas and
+    lxml against). Requires a browser and network access.
+
+    Arguments
+    ---------
+
+    url : str, required
+        The URL of a Tennis Abstract player data page.
+
+    name : str, required
+        The fixture's file name (without extension) in FIXTURE_DIR.
+
+    browser : str, optional
+        The browser that selenium will drive headlessly to `url`.
+        [default: 'chromium']
+    '''
+    from construct_query import DownloadStats
+    from execute_query import QueryData, get_http_pool
+
+    tour = DownloadStats._validate_tour('', url)
+    query = QueryData(url, tour, browser)
+    page = get_http_pool().get(url)
+    data = DownloadStats.merge_and_edit_tables(query.html_tables)
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), 'w') as file:
+        json.dump({'url': url, 'tour': tour, 'title': query.title,
+                   'html_tables': query.html_tables, 'page': page,
+                   'expected': frame_digest(data)}, file)
+
+
+def frame_digest(match_data):
+    '''
+    Return a DataFrame from DownloadStats.merge_and_edit_tables() as a dict
+    of JSON-ready 'columns' and 'data' (rows), which is how recorded
+    fixtures save the result their tables should format into.
+    '''
+    return json.loads(match_data.to_json(orient='split', index=False,
+                                         date_format='iso'))
+
+
+def load_recorded():
+    '''
+    Return a dict of every recorded fixture in FIXTURE_DIR, keyed by name.
+    '''
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path) as file:
+            fixture = json.load(file)
+
+        # count rows in the first table, minus the header and link rows
+        fixture['rows'] = max(fixture['html_tables'][0].count('<tr') - 2, 0)
+        fixtures[os.path.splitext(os.path.basename(path))[0]] = fixture
+
+    return fixtures
@@ -0,0 +1,322 @@
+'''
+A local stand-in for Tennis Abstract that serves deterministic pages, so the
+browser pool, the plain-HTTP backend, and the parser can be load-tested
+without sending traffic to the real site.
+
+It mimics the parts of the site this package interacts with:
+
+- the homepage's `#tags` search bar, which lists matching '(M) Name' or
+  '(W) Name' suggestions as `a.ui-corner-all` links after a keydown event
+  (and exposes its player list through a minimal `$('#tags').autocomplete`
+  stand-in for PlayerList)
+
+- `player-classic.cgi` and `wplayer-classic.cgi` pages with a `#tablelabel`
+  title, a `#matches` table built from the synthetic fixtures in
+  `fixtures.py`, and the `revscore`, `statsr`/`statsw` (ATP), and `srclick`
+  (WTA) toggles that QueryData() clicks. 'start date'/'end date' filters
+  (`&f=Acx<start><end>`) are honored; other filters are ignored.
+
+Player pages saved from the real site with fixtures.record_fixture() are
+replayed as recorded instead, for requests with the same player and
+filters. Only the page itself is recorded, so scripts it loads from the
+site's own host aren't available to a browser; the 'http' backend and the
+parser only need the page.
+
+Pass its `home_url` as the `home_url` argument of DownloadStats() or
+ConstructURL(). Run it from the repository's root with:
+
+    python benchmarks/standin_server.py --port 8000
+'''
+import argparse
+import html
+import http.server
+import json
+import os
+import re
+import sys
+import threading
+import urllib.parse
+import zlib
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixtures  # noqa: E402
+
+PLAYERS = ['(M) Roger Federer', '(M) Rafael Nadal', '(M) Novak Djokovic',
+           '(M) Andy Murray', '(M) Jo Wilfried Tsonga', '(M) Gael Monfils',
+           '(M) Juan Martin Del Potro', '(M) Juan Monaco', '(M) Arthur Ashe',
+           '(M) Arnaud Clement', '(M) Guillermo Canas', '(M) James Blake',
+           '(W) Serena Williams', '(W) Venus Williams', '(W) Simona Halep',
+           '(W) Sabine Lisicki', '(W) Bianca Andreescu',
+           '(W) Angelique Kerber', '(W) Caroline Wozniacki']
+
+HOME_PAGE = '''<html><head><title>Tennis Abstract (stand-in)</title></head>
+<body>
+<input id="tags" type="text">
+<ul id="suggestions"></ul>
+<script>
+var playerlist = %s;
+
+// just enough of jQuery UI's autocomplete for PlayerList to read its source
+window.$ = function(sel) {
+    return {autocomplete: function(opt, key) { return playerlist; }};
+};
+
+document.getElementById('tags').addEventListener('keydown', function() {
+    var entered = this.value.toLowerCase();
+    var matches = playerlist.filter(p => p.toLowerCase().includes(entered));
+    document.getElementById('suggestions').innerHTML = matches.slice(0, 10)
+        .map(p => '<li><a class="ui-corner-all">' + p + '</a></li>').join('');
+});
+</script>
+</body></html>'''
+
+PLAYER_PAGE = '''<html><head><title>%(name)s (stand-in)</title></head>
+<body>
+<span class="revscore likelink">Reverse Loss Scores</span>
+<div id="tablelabel">%(title)s</div>
+%(toggles)s
+<div id="holder">%(table)s</div>
+<script>
+var views = %(views)s;
+var holder = document.getElementById('holder');
+var reversed = false;
+var shown = 0;
+
+// like the site, write the set scores of losses from the player's side
+function reverseLosses() {
+    var table = document.getElementById('matches');
+    if (!table || !table.querySelector('th')) { return; }
+    var head = Array.from(table.rows[0].cells).map(c => c.textContent);
+    var result = head.indexOf(''), score = head.indexOf('Score');
+    Array.from(table.rows).slice(1).forEach(function(tr) {
+        var cells = tr.cells;
+        if (cells.length > Math.max(result, score)
+                && cells[result].textContent.trim().endsWith('d.')) {
+            cells[score].textContent = cells[score].textContent
+                .replace(/(\\d+)-(\\d+)/g, '$2-$1');
+        }
+    });
+}
+function show(i) {
+    shown = i;
+    holder.innerHTML = views[i];
+    if (reversed) { reverseLosses(); }
+}
+
+document.querySelector('span.revscore').onclick = function() {
+    reversed = !reversed;
+    this.textContent = reversed ? 'Standard Scores' : 'Reverse Loss Scores';
+    show(shown);
+};
+
+document.querySelectorAll('span.view').forEach(function(span) {
+    span.onclick = function() {
+        if (span.classList.contains('srclick')) {
+            // the WTA toggle flips between two views and relabels itself
+            var serving = span.textContent === 'Show Return Stats';
+            show(serving ? 1 : 0);
+            span.textContent = serving ? 'Show Serve Stats'
+                                       : 'Show Return Stats';
+        } else {
+            show(Number(span.dataset.view));
+            document.querySelectorAll('span.view')
+                .forEach(s => s.classList.add('likelink'));
+            span.classList.remove('likelink');
+        }
+    };
+});
+</script>
+</body></html>'''
+
+ATP_TOGGLES = ('<span class="view statso" data-view="0">Serve</span> '
+               '<span class="view statsr likelink" data-view="1">'
+               'Return</span> '
+               '<span class="view statsw likelink" data-view="2">Raw</span>')
+WTA_TOGGLES = ('<span class="view srclick likelink">Show Return Stats</span>')
+
+
+class StandInServer:
+    '''
+    Serves the stand-in site from a background thread.
+
+    Arguments
+    ---------
+
+    port : int, optional
+        The port to listen on. Picks a free one if 0. [default: 0]
+
+    players : list of str, optional
+        The search bar's suggestions, in the site's '(M) Name' format.
+        [default: PLAYERS]
+
+    n_matches : int, optional
+        The number of career matches generated for each player. [default: 300]
+
+    recordings : dict, optional
+        Recorded fixtures, as returned by fixtures.load_recorded(), whose
+        pages are served in place of generated ones. [default: None]
+    '''
+    def __init__(self, port=0, players=PLAYERS, n_matches=300,
+                 recordings=None):
+        self.players = list(players)
+        self.n_matches = n_matches
+
+        # pages are built once per (tour, player, filters); kept on the
+        # instance so they're freed along with the server
+        self._pages = {}
+        self._pages_lock = threading.Lock()
+        for fx in (recordings or {}).values():
+            if fx.get('page'):
+                self._pages[self.page_key(fx['url'])] = fx['page']
+
+        handler = type('Handler', (StandInHandler,), {'site': self})
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                       handler)
+        self._thread = None
+
+    @property
+    def home_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def home_page(self):
+        return HOME_PAGE % json.dumps(self.players)
+
+    @staticmethod
+    def page_key(url):
+        '''
+        Return the (tour, player, filters) key that player_page() files the
+        page at `url` under.
+        '''
+        parts = urllib.parse.urlsplit(url)
+        params = query_params(parts.query)
+        page_name = parts.path.rsplit('/', 1)[-1]
+        tour = 'WTA' if page_name.startswith('w') else 'ATP'
+        return tour, params.get('p', ''), params.get('f', '')
+
+    def player_page(self, name_str, tour, filters):
+        '''
+        Return the match data page for the player whose URL slug is
+        `name_str`, honoring any custom date range in `filters`. Recorded
+        pages are served as-is.
+        '''
+        key = (tour, name_str, filters)
+        with self._pages_lock:
+            page = self._pages.get(key)
+        if page is None:
+            page = self.build_page(name_str, tour, filters)
+            with self._pages_lock:
+                page = self._pages.setdefault(key, page)
+
+        return page
+
+    def build_page(self, name_str, tour, filters):
+        '''
+        Build a deterministic match data page from the synthetic fixtures.
+        '''
+        # seed each player's matches with their name so pages never change
+        matches = fixtures.make_matches(self.n_matches,
+                                        seed=zlib.crc32(name_str.encode()))
+        span = 'Career'
+
+        dates = re.search(r'Acx(\d{8})(\d{8})', filters)
+        if dates:
+            start, end = (datetime.strptime(dt, '%Y%m%d')
+                          for dt in dates.groups())
+            matches = [mt for mt in matches if start <= datetime.strptime(
+                           mt['Date'].replace('‑', '-'), '%d-%b-%Y') <= end]
+            span = (f"{start:%d-%b-%Y} to {end:%d-%b-%Y} [custom]")
+
+        wins = sum(mt[''].startswith('d.') for mt in matches)
+        title = f"Matches ({wins}-{len(matches) - wins}) > Time Span: {span}"
+
+        if matches:
+            views = [fixtures.make_table(matches, cols)
+                     for cols in fixtures.VIEW_COLS[tour]]
+        else:
+            views = ["<table id='matches'><tr><td><p>No matches found.</p>"
+                     "</td></tr></table>"] * len(fixtures.VIEW_COLS[tour])
+
+        return PLAYER_PAGE % {
+            'name': construct_name(name_str), 'title': html.escape(title),
+            'toggles': ATP_TOGGLES if tour == 'ATP' else WTA_TOGGLES,
+            'table': views[0],
+            # keep '</' out of the script so the browser doesn't end it early
+            'views': json.dumps(views).replace('</', '<\\/')}
+
+
+def construct_name(name_str):
+    # 'RogerFederer' -> 'Roger Federer'
+    return re.sub(r'(?<=.)([A-Z])', r' \1', name_str)
+
+
+def query_params(query):
+    # keep '+' and ',' in `f` intact, unlike parse_qs
+    return dict(pr.split('=', 1) for pr in query.split('&') if '=' in pr)
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    site = None  # set to a StandInServer by StandInServer.__init__()
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        page_name = parts.path.rsplit('/', 1)[-1]
+
+        if parts.path == '/':
+            self.respond(200, self.site.home_page())
+        elif page_name in {'player-classic.cgi', 'wplayer-classic.cgi'}:
+            tour, name_str, filters = StandInServer.page_key(self.path)
+            self.respond(200, self.site.player_page(name_str, tour, filters))
+        else:
+            self.respond(404, '<html><body>Not found.</body></html>')
+
+    def respond(self, status, page):
+        body = page.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--matches', type=int, default=300,
+                        help='career matches per player [default: 300]')
+    args = parser.parse_args()
+
+    server = StandInServer(args.port, n_matches=args.matches,
+                           recordings=fixtures.load_recorded())
+    print(f"Serving a stand-in Tennis Abstract at {server.home_url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,29 @@
-import functools as ft
+import asyncio
+import concurrent.futures as cf
+import contextvars
+import itertools
 import numpy as np
 import re
 import pandas as pd
+import threading
+import time
 import warnings
 
-from bs4 import BeautifulSoup
-from execute_query import NameCheck, QueryData
+from datetime import datetime
+from execute_query import (DriverPool, HOME_URL, HTTPQueryData, QueryData,
+                           get_flight, get_pool, resolve_names)
+from pandas.io.parsers import TextParser
+from parse_tables import parse_table
+from response_cache import ResponseCache, get_cache
+from tracing import get_tracer
+from url_cache import get_url_cache
 from validate_attrs import ValidateURLAttrs
 
+class NoMatchesError(ValueError):
+    '''
+    Raised when a query's filters leave no matches on the player's page.
+    '''
+
 class ConstructURL(ValidateURLAttrs):
     '''
     Takes a player's name and (optionally) a dictionary of attributes to filter
@@ -44,14 +60,42 @@ class ConstructURL(ValidateURLAttrs):
         or in rich format online at:
         https://github.com/ojustino/tennis-abs-api/blob/master/attrs_docs.md
 
+    pool : execute_query.DriverPool or None, optional
+        The pool from which NameCheck() borrows browsers. If None, uses the
+        shared pool for `browser`. [default: None]
+
+    home_url : str, optional
+        The homepage of the site to query. Point it elsewhere (e.g., at the
+        stand-in server in `benchmarks/`) to avoid the real site.
+        [default: 'http://www.tennisabstract.com/']
+
+    wait : execute_query.WaitPolicy or None, optional
+        How NameCheck() waits for the site's search suggestions. If None,
+        uses a WaitPolicy() with its default settings. [default: None]
+
+    url_cache : url_cache.URLCache, None, or False, optional
+        Where previously encoded `attrs` are saved. If None, uses the shared
+        cache from url_cache.get_url_cache(); if False, always encodes them
+        anew. [default: None]
     '''
-    def __init__(self, name, tour, browser='chromium', attrs={}):
-        # check name first
-        name_obj = NameCheck(name, tour, browser=browser)
-        name_str = name_obj.name_str
+    def __init__(self, name, tour, browser='chromium', attrs={}, pool=None,
+                 home_url=HOME_URL, wait=None, url_cache=None):
+        url_cache = get_url_cache() if url_cache is None else url_cache
+
+        # check the player's name and any opponents' names in one batch. (if
+        # these attrs were encoded before, the opponents don't need checking)
+        names = [name]
+        if (not url_cache
+                or url_cache.key(attrs, tour, home_url) not in url_cache):
+            names += self._opponent_names(attrs)
+        resolved = resolve_names(names, tour, url=home_url, browser=browser,
+                                 pool=pool, wait=wait)
+        name_str = resolved[name]
 
         self.name = self.spaced_name_str(name_str)
-        self.URL = self.generate_url(name_str, tour, browser, attrs)
+        self.URL = self.generate_url(name_str, tour, browser, attrs, pool=pool,
+                                     home_url=home_url, resolved=resolved,
+                                     url_cache=url_cache)
 
     @staticmethod
     def spaced_name_str(name_str):
@@ -88,7 +132,8 @@ class ConstructURL(ValidateURLAttrs):
 
         return name_str
 
-    def generate_url(self, name_str, tour, browser, attrs={}):
+    def generate_url(self, name_str, tour, browser, attrs={}, pool=None,
+                     home_url=HOME_URL, resolved=None, url_cache=None):
         '''
         Create the matching URL for a specific query to a player's match data
         page on Tennis Abstract by translating the user's chosen name and
@@ -117,8 +162,26 @@ class ConstructURL(ValidateURLAttrs):
             allowed; find a full accounting locally in `attrs_docs.md`
             or in rich format online at:
             https://github.com/ojustino/tennis-abs-api/blob/master/attrs_docs.md
+
+        pool : execute_query.DriverPool or None, optional
+            The pool from which NameCheck() borrows browsers for any
+            'head-to-head' or 'exclude opp' names. [default: None]
+
+        home_url : str, optional
+            The homepage of the site to query.
+            [default: 'http://www.tennisabstract.com/']
+
+        resolved : dict or None, optional
+            Opponents' names that were already resolved, mapped to their name
+            strings. Others are looked up by self._validate_attrs().
+            [default: None]
+
+        url_cache : url_cache.URLCache, None, or False, optional
+            Where previously encoded `attrs` are saved. If None, uses the
+            shared cache from url_cache.get_url_cache(); if False, always
+            encodes them anew. [default: None]
         '''
-        query_url = 'http://www.tennisabstract.com/cgi-bin/'
+        query_url = home_url + 'cgi-bin/'
 
         # account for female players' slightly different URL format
         tour = tour.upper()
@@ -136,11 +199,114 @@ class ConstructURL(ValidateURLAttrs):
         # add name_str, which is already properly formatted
         query_url += name_str
 
-        # then, add query (or ask for whole career data if attrs is empty)
-        query_url += self._validate_attrs(tour, browser=browser, **attrs)
+        # then, add query (or ask for whole career data if attrs is empty).
+        # reuse the encoded attrs if an equivalent dict was seen before
+        url_cache = get_url_cache() if url_cache is None else url_cache
+        key = url_cache.key(attrs, tour, home_url) if url_cache else None
+        code = None if key is None else url_cache.get(key)
+
+        if code is None:
+            if key is not None:
+                attrs = url_cache.distinct(attrs)
+            code = self._validate_attrs(tour, browser=browser, pool=pool,
+                                        home_url=home_url, resolved=resolved,
+                                        **attrs)
+            if key is not None:
+                url_cache.put(key, code)
+
+        query_url += code
 
         return query_url
 
+    @classmethod
+    def sweep(cls, players, tour, grid={}, windows=None, attrs={},
+              browser='chromium', pool=None, home_url=HOME_URL, wait=None,
+              url_cache=None):
+        '''
+        Lazily generate the URLs for every combination of players, date
+        windows, and attribute values in a parameter sweep (e.g., every player
+        x every surface x every year). Yields `(spec, url)` pairs, where
+        `spec` is a dict with the combination's 'name', 'tour', and 'attrs'
+        (the same format as a BatchDownloader() spec).
+
+        Each player's name and every opponent's name are checked once, in one
+        batch, before the first URL is yielded, and each attribute value in
+        `grid` is validated up front so a bad one fails fast. Combinations are
+        built one at a time, so memory use doesn't grow with the size of the
+        sweep; with the shared URLCache, each combination of attributes is
+        only encoded once for all players.
+
+        Arguments
+        ---------
+
+        players : list of str, required
+            The players' names, in any format NameCheck() accepts.
+
+        tour : str, required
+            The players' tour. Should be 'WTA' if they're female or 'ATP' if
+            they're male.
+
+        grid : dict, optional
+            Maps attribute keys (as in ConstructURL()'s `attrs`) to lists of
+            the values to sweep over. Each combination takes one value per
+            key; a value may itself be a list, as in `attrs`. [default: {}]
+
+        windows : list or None, optional
+            The date windows to sweep over. Each is either a tuple of 'start
+            date' and 'end date' datetimes or an int for a whole year. If None,
+            every combination covers the players' whole careers.
+            [default: None]
+
+        attrs : dict, optional
+            Attributes added to every combination (e.g., a 'head-to-head'
+            opponent). [default: {}]
+
+        browser, pool, home_url, wait : optional
+            As in ConstructURL().
+
+        url_cache : url_cache.URLCache, None, or False, optional
+            As in ConstructURL(). [default: None]
+        '''
+        tour = tour.upper()
+        players = list(players)
+        keys = list(grid)
+        values = [list(grid[key]) for key in keys]
+        windows = [None] if windows is None else [
+            (datetime(wd, 1, 1), datetime(wd, 12, 31)) if type(wd) == int
+            else tuple(wd) for wd in windows]
+
+        # check every name in the sweep in one batch
+        opponents = cls._opponent_names(attrs)
+        for key, vals in zip(keys, values):
+            if key in {cls.H2H_KEY, cls.EXCLUDE_KEY}:
+                opponents += cls._opponent_names(
+                    {key: [nm for vl in vals for nm in
+                           (vl if type(vl) == list else [vl])]})
+        resolved = resolve_names(players + opponents, tour,
+                                 url=home_url, browser=browser, pool=pool,
+                                 wait=wait)
+
+        # validate each value on its own before building any combinations
+        encoder = cls.__new__(cls)
+        for key, vals in zip(keys, values):
+            for val in vals:
+                encoder.encode({**attrs, key: val}, tour, resolved)
+
+        for name in players:
+            name_str = resolved[name]
+            for window in windows:
+                dates = ({} if window is None else
+                         {cls.TIME1_KEY: window[0], cls.TIME2_KEY: window[1]})
+
+                for combo in itertools.product(*values):
+                    combo_attrs = {**attrs, **dates, **dict(zip(keys, combo))}
+                    url = encoder.generate_url(
+                        name_str, tour, browser, combo_attrs, pool=pool,
+                        home_url=home_url, resolved=resolved,
+                        url_cache=url_cache)
+                    yield ({'name': name, 'tour': tour, 'attrs': combo_attrs},
+                           url)
+
 class DownloadStats:
     '''
     Takes either a link to a player data page on Tennis Abstract or a player's
@@ -150,7 +316,8 @@ class DownloadStats:
 
     Saves the result in the self.match_data attribute, a pandas DataFrame. Also
     saves the table title (self.title), the player's name as it appears on the
-    site (self.name), and the query's URL (self.URL).
+    site (self.name), the query's URL (self.URL), and whether the raw result
+    came from the local response cache (self.from_cache).
 
     Does not inherit, but does create instances of ConstructURL() and
     QueryData() to handle parts of the process indicated in those class' names.
@@ -186,15 +353,243 @@ class DownloadStats:
     browser : str, required
         The browser that selenium will drive headlessly to the relevant URL.
         For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
+
+    pool : execute_query.DriverPool or None, optional
+        The pool from which every step of the query borrows browsers. If None,
+        uses the shared pool for `browser`. [default: None]
+
+    backend : str, optional
+        How to fetch the match data page. 'browser' drives `browser` through
+        the page with QueryData(). 'http' is experimental: it downloads the
+        page source with HTTPQueryData() instead, which is much faster but
+        only reads pages that embed their stat views the way the local
+        stand-in site in benchmarks/ does, so use 'browser' for Tennis
+        Abstract itself. (Name lookups still use the local player index or a
+        browser.) [default: 'browser']
+
+    cache : response_cache.ResponseCache, bool, or None, optional
+        The on-disk cache of raw query results to check before fetching the
+        page and to update afterward. Caching is off unless asked for: if
+        True, uses the shared cache from response_cache.get_cache(), which
+        keeps results in execute_query.CACHE_DIR for a week; if None or
+        False, never uses a cache. [default: None]
+
+    refresh : boolean, optional
+        When True, fetches the page even if the query is cached and replaces
+        the cached result. [default: False]
+
+    home_url : str, optional
+        The homepage of the site to query when building a URL from `name`.
+        Point it elsewhere (e.g., at the stand-in server in `benchmarks/`) to
+        avoid the real site. [default: 'http://www.tennisabstract.com/']
+
+    wait : execute_query.WaitPolicy or None, optional
+        How browsers wait for changes on the site's pages (search suggestions
+        and table views), including how often to retry slow pages. If None,
+        uses a WaitPolicy() with its default settings. [default: None]
+
+    lean : boolean, optional
+        When True and no `pool` is given, borrows browsers from the shared
+        lean pool, whose browsers skip images, stylesheets, fonts, and
+        trackers and stop waiting on page loads once the HTML is parsed. (A
+        given `pool` keeps its own setting.) [default: False]
+
+    extract : str, optional
+        How the 'browser' backend retrieves the tables. 'html' sends back
+        each view's markup; 'json' reads every view's cells with one script
+        in the page, which skips most of the transfer and the HTML parsing.
+        See QueryData() for details. [default: 'html']
+
+    compact : boolean, optional
+        When True, stores self.match_data with the smallest dtypes that hold
+        its values -- categories for repetitive text, 8- to 32-bit integers,
+        32-bit floats, and pyarrow-backed strings (when pyarrow is installed)
+        -- which takes several times less memory when many players' frames
+        are kept around. See DownloadStats.compact_dtypes(). [default: False]
+
+    flight : execute_query.SingleFlight, None, or False, optional
+        Coalesces concurrent identical queries (same URL and backend) so only
+        one of them fetches the page and the rest share its result. Give it a
+        SingleFlight with a `lock_dir` to also have queries in other processes
+        wait for the page and then read it from the shared `cache`. If None,
+        uses the shared in-process SingleFlight from
+        execute_query.get_flight(); if False, doesn't coalesce queries.
+        [default: None]
+
+    chunk : int or False, optional
+        When an int, splits the query's 'start date'/'end date' range (or the
+        player's whole career) into windows of that many calendar years
+        (True is the same as 1), downloads the windows concurrently as
+        separate queries, and joins their match data. Smaller pages load
+        faster, fail independently, and are cached separately, so a long
+        career that gains a few matches only needs its latest window fetched
+        again. Career windows are fetched newest first, a round of `workers`
+        at a time; when a round's oldest window is empty, one query for all
+        earlier years shows whether the career began there or resumes in an
+        earlier year, so breaks of any length are covered. Windows without
+        matches are cached, too. [default: False]
+
+    workers : int, optional
+        The number of windows downloaded at once when `chunk` is set. Each
+        still borrows browsers from `pool` as needed. [default: 4]
     '''
-    def __init__(self, name=None, tour='', attrs={},
-                 url=None, browser='chromium'):
+    # the site's match data begins in the open era
+    FIRST_YEAR = 1968
+
+    def __init__(self, name=None, tour='', attrs={}, url=None,
+                 browser='chromium', pool=None, backend='browser', cache=None,
+                 refresh=False, home_url=HOME_URL, wait=None, lean=False,
+                 extract='html', compact=False, flight=None, chunk=False,
+                 workers=4):
         # either make sure a proper tour was provided or infer tour from URL
         self.tour = self._validate_tour(tour, url)
+        self._validate_backend(backend)
+        self.browser = browser
+        if pool is None and lean:
+            pool = get_pool(browser, lean=True)
+
+        # time each stage of the query in self.timings
+        with get_tracer().span('DownloadStats', tour=self.tour,
+                               backend=backend) as span:
+            self.timings = span
+            self._locate(name, attrs, url, pool, home_url, wait)
+            span.attrs['url'] = self.URL
+
+            if chunk:
+                result = self._download_windows(
+                    int(chunk), workers, pool=pool, backend=backend,
+                    cache=cache, refresh=refresh, wait=wait, extract=extract,
+                    flight=flight)
+                self._settle(*result, compact)
+                return
+
+            # make the query (unless its result is cached or another
+            # identical query is already making it). then, format the results
+            # and save the table title
+            cache = get_cache() if cache is True else cache
+            flight = get_flight() if flight is None else flight
+            cached = self._check_cache(cache, backend, refresh)
+
+            if cached is None:
+                def download():
+                    cached = self._recheck_cache(cache, backend, refresh,
+                                                 flight)
+                    if cached is not None:
+                        return self._finish(*cached, cache, backend)
+
+                    if backend == 'browser':
+                        query = QueryData(self.URL, self.tour, self.browser,
+                                          pool=pool, wait=wait,
+                                          extract=extract)
+                    else: # == 'http'
+                        query = HTTPQueryData(self.URL, self.tour)
+                    return self._finish(query.html_tables, query.title, cache,
+                                        backend, fresh=True)
+
+                result = (flight.run(self._flight_key(backend), download)
+                          if flight else download())
+            else:
+                result = self._finish(*cached, cache, backend)
+
+            self._settle(*result, compact)
+
+    @classmethod
+    async def fetch(cls, name=None, tour='', attrs={}, url=None,
+                    browser='chromium', pool=None, backend='browser',
+                    cache=None, refresh=False, home_url=HOME_URL, wait=None,
+                    lean=False, extract='html', compact=False, flight=None,
+                    chunk=False, workers=4):
+        '''
+        The asyncio counterpart of DownloadStats(). Takes the same arguments
+        and returns the finished instance; use it as
+        `await DownloadStats.fetch(name, tour, ...)`.
+
+        With backend='http', the page is downloaded on the event loop by the
+        shared AsyncHTTPPool, so many queries can be in flight without
+        occupying threads. Steps that need a browser (the 'browser' backend and
+        building a URL from `name`) run in worker threads, but only once one
+        of `pool`'s browsers is free (see DriverPool.run_in_thread()).
+        Cache lookups and formatting the tables also happen in worker
+        threads.
+
+        A `chunk`ed query runs in a worker thread as a whole, since its
+        windows are already downloaded concurrently.
+        '''
+        if chunk:
+            return await asyncio.to_thread(
+                cls, name, tour, attrs, url, browser=browser, pool=pool,
+                backend=backend, cache=cache, refresh=refresh,
+                home_url=home_url, wait=wait, lean=lean, extract=extract,
+                compact=compact, flight=flight, chunk=chunk, workers=workers)
+
+        self = cls.__new__(cls)
+        self.tour = self._validate_tour(tour, url)
+        self._validate_backend(backend)
+        self.browser = browser
+        pool = get_pool(browser, lean=lean) if pool is None else pool
+
+        with get_tracer().span('DownloadStats', tour=self.tour,
+                               backend=backend) as span:
+            self.timings = span
+            if url is None:
+                await pool.run_in_thread(self._locate, name, attrs, url, pool,
+                                         home_url, wait)
+            else:
+                self._locate(name, attrs, url, pool, home_url, wait)
+            span.attrs['url'] = self.URL
+
+            # the cache is an SQLite file, so look things up in a worker
+            # thread to keep the event loop free for other queries
+            cache = (await asyncio.to_thread(get_cache) if cache is True
+                     else cache)
+            flight = get_flight() if flight is None else flight
+            cached = await asyncio.to_thread(self._check_cache, cache,
+                                             backend, refresh)
+
+            if cached is None:
+                async def download():
+                    cached = await asyncio.to_thread(
+                        self._recheck_cache, cache, backend, refresh, flight)
+                    if cached is not None:
+                        return await asyncio.to_thread(self._finish, *cached,
+                                                       cache, backend)
+
+                    if backend == 'browser':
+                        query = await pool.run_in_thread(
+                            QueryData, self.URL, self.tour, self.browser,
+                            pool=pool, wait=wait, extract=extract)
+                    else: # == 'http'
+                        query = await HTTPQueryData.fetch(self.URL, self.tour)
+                    return await asyncio.to_thread(
+                        self._finish, query.html_tables, query.title, cache,
+                        backend, fresh=True)
+
+                result = (await flight.arun(self._flight_key(backend),
+                                            download)
+                          if flight else await download())
+            else:
+                result = await asyncio.to_thread(self._finish, *cached, cache,
+                                                 backend)
+
+            self._settle(*result, compact)
 
+        return self
+
+    def _validate_backend(self, backend):
+        if backend not in {'browser', 'http'}:
+            raise ValueError('invalid backend. choose "browser" or "http".')
+
+    def _locate(self, name, attrs, url, pool, home_url, wait):
+        '''
+        Save the query's URL and the player's name as it appears on the site,
+        generating the URL from `name` and `attrs` if no `url` was provided.
+        '''
         if url is None:
             # generate the query's URL; save player's name as shown on the site
-            url_obj = ConstructURL(name, self.tour, browser=browser,attrs=attrs)
+            with get_tracer().span('ConstructURL', player=name):
+                url_obj = ConstructURL(name, self.tour, browser=self.browser,
+                                       attrs=attrs, pool=pool,
+                                       home_url=home_url, wait=wait)
             self.URL = url_obj.URL
             self.name = url_obj.name
         else:
@@ -205,14 +600,278 @@ class DownloadStats:
             formatted_name = re.search('p=[a-zA-Z]+', self.URL).group()[2:]
             self.name = ConstructURL.spaced_name_str(formatted_name)
 
-        # make the query. then, format the results and save the table title
-        self.browser = browser
-        query = QueryData(self.URL, self.tour, self.browser)
-        self.title = query.title
-        self.match_data = self.merge_and_edit_tables(query.html_tables)
+    def _check_cache(self, cache, backend, refresh):
+        '''
+        Return the query's cached tables and title (or None if there aren't
+        any or they should be refreshed) and note where the result came from.
+        '''
+        if cache and not refresh:
+            with get_tracer().span('cache get') as span:
+                cached = cache.get(self.URL, backend)
+                span.attrs['hit'] = cached is not None
+        else:
+            cached = None
 
+        self.from_cache = cached is not None
+        return cached
 
-    def _validate_tour(self, tour, url):
+    def _recheck_cache(self, cache, backend, refresh, flight):
+        '''
+        Check the cache again once this query holds a cross-process lock,
+        since another process may have saved its result in the meantime.
+        '''
+        if not (flight and flight.lock_dir and cache) or refresh:
+            return None
+        return cache.get(self.URL, backend)
+
+    def _download_windows(self, years, workers, **kwargs):
+        '''
+        Split the query into windows of `years` calendar years, download them
+        concurrently with the DownloadStats() arguments in `kwargs`, and
+        return the combined title, match data (newest first, as on the site),
+        and whether every window came from the cache.
+        '''
+        if years < 1:
+            raise ValueError('`chunk` should be a positive number of years.')
+
+        # the date range is the first code under '&f=' in the URL
+        dates = re.search(r'&f=A(?:Career|cx(\d{8})(\d{8}))qq', self.URL)
+        if dates is None and '&f=' in self.URL:
+            raise ValueError("Can't split this URL's query into date windows.")
+
+        career = dates is None or dates.group(1) is None
+        if career:
+            start = datetime(self.FIRST_YEAR, 1, 1)
+            end = datetime(datetime.now().year, 12, 31)
+        else:
+            start, end = sorted(datetime.strptime(dt, '%Y%m%d')
+                                for dt in dates.groups())
+
+        def window(year):
+            # the window of `years` years that ends on the last day of `year`
+            return (max(start, datetime(year - years + 1, 1, 1)),
+                    min(end, datetime(year, 12, 31)))
+
+        def download(window):
+            code = '&f=Acx' + ''.join(f"{dt:%Y%m%d}" for dt in window) + 'qq'
+            url = (self.URL.replace(dates.group(), code) if dates
+                   else self.URL + code)
+            try:
+                return DownloadStats(url=url, browser=self.browser, **kwargs)
+            except NoMatchesError:
+                return None
+
+        with cf.ThreadPoolExecutor(max_workers=workers) as executor:
+            def download_all(years_ending):
+                # (each window runs in a copy of this context so its timings
+                # nest under this query's)
+                return [fut.result() for fut in [
+                    executor.submit(contextvars.copy_context().run, download,
+                                    window(yr))
+                    for yr in years_ending]]
+
+            # windows count back from `end`
+            if not career:
+                results = download_all(range(end.year, start.year - 1,
+                                             -years))
+
+            # a career's first year isn't known, so walk back a round of
+            # windows at a time. whenever a round's oldest window is empty,
+            # one query for every earlier year tells whether to stop or where
+            # the matches pick up again, so breaks don't cut careers short
+            else:
+                results = []
+                year = end.year
+                while year >= start.year:
+                    years_ending = range(year, max(start.year - 1,
+                                                   year - years * workers),
+                                         -years)
+                    batch = download_all(years_ending)
+                    results += batch
+                    year = years_ending[-1] - years
+
+                    if batch[-1] is None and year >= start.year:
+                        earlier = download((start, datetime(year, 12, 31)))
+                        if earlier is None:
+                            break
+                        year = earlier.match_data['Date'].max().year
+
+        stats = [st for st in results if st is not None]
+        if not stats:
+            raise NoMatchesError('Your filters produced no matches. '
+                                 'Try making them less stringent?')
+
+        # describe the whole range in the title, as a single query would.
+        # (only add up the windows' records if every title has one)
+        title = stats[0].title
+        records = [re.search(r'\((\d+)-(\d+)\)', st.title) for st in stats]
+        if all(records):
+            record = [sum(int(rc) for rc in col)
+                      for col in zip(*[rc.groups() for rc in records])]
+            title = re.sub(r'\(\d+-\d+\)', '({}-{})'.format(*record), title,
+                           count=1)
+
+        span = ('Career' if career else
+                f"{start:%d-%b-%Y} to {end:%d-%b-%Y} [custom]")
+        title = re.sub(r'Time Span: [^;]*', f"Time Span: {span}", title,
+                       count=1)
+
+        match_data = pd.concat(
+            self.align_dtypes([st.match_data for st in stats]),
+            ignore_index=True)
+        return title, match_data, all(st.from_cache for st in stats)
+
+    def _flight_key(self, backend):
+        return f"{backend}|{ResponseCache.normalize_url(self.URL)}"
+
+    def _finish(self, html_tables, title, cache, backend, fresh=False):
+        '''
+        Format the raw tables, then cache them if they were `fresh`ly
+        downloaded. Returns the title, the formatted match data, and whether
+        the tables came from the cache.
+        '''
+        with get_tracer().span('merge_and_edit_tables',
+                               tables=len(html_tables)):
+            try:
+                match_data = self.merge_and_edit_tables(html_tables)
+            except NoMatchesError:
+                # a page without matches is an answer, too (e.g., for an empty
+                # window of a chunked query), so the next query can skip it
+                if cache and fresh:
+                    with get_tracer().span('cache put'):
+                        cache.put(self.URL, html_tables, title, backend)
+                raise
+
+        # otherwise, only save results that were formatted without errors
+        if cache and fresh:
+            with get_tracer().span('cache put'):
+                cache.put(self.URL, html_tables, title, backend)
+
+        return title, match_data, not fresh
+
+    def _settle(self, title, match_data, from_cache, compact):
+        '''
+        Save the formatted result (which may be shared with concurrent
+        identical queries) in this instance.
+        '''
+        self.title = title
+        self.from_cache = from_cache
+        self.match_data = match_data.copy()
+        if compact:
+            with get_tracer().span('compact_dtypes'):
+                self.match_data = self.compact_dtypes(self.match_data)
+
+    @staticmethod
+    def compact_dtypes(data, max_category_share=.5):
+        '''
+        Return a copy of a match data DataFrame with smaller dtypes:
+
+        - text columns of numbers (e.g., 'Rk' or 'Aces') become numeric
+        - integer columns become the smallest nullable integer type (Int8,
+          Int16, or Int32) that fits their values
+        - other floats (e.g., percentages) become float32
+        - text columns that repeat a few values (e.g., 'Tournament',
+          'Surface', 'Rd', or 'Result') become categories
+        - remaining text becomes pyarrow-backed strings if pyarrow is installed
+          (and pandas supports them), or is left alone otherwise
+
+        (Marked as a static method so it can also shrink frames that were
+        downloaded without `compact=True`.)
+
+        Arguments
+        ---------
+
+        data : pandas.DataFrame, required
+            A DataFrame from merge_and_edit_tables(), like self.match_data.
+
+        max_category_share : float, optional
+            Text columns become categories if their number of unique values
+            is at most this share of their number of rows. [default: .5]
+        '''
+        try:
+            string_dtype = pd.StringDtype('pyarrow')
+        except (ImportError, TypeError): # no pyarrow or pandas < 1.3
+            string_dtype = None
+
+        compact = {}
+        for col in data.columns:
+            column = data[col]
+
+            whole = pd.api.types.is_integer_dtype(column)
+            if column.dtype == object:
+                # keep numbers stored as text only if they all convert
+                numbers = pd.to_numeric(column, errors='coerce')
+                if numbers.notna().sum() == column.notna().sum() > 0:
+                    column = numbers
+                    whole = (numbers.dropna() % 1 == 0).all()
+                elif column.nunique() <= max_category_share * len(column):
+                    compact[col] = column.astype('category')
+                    continue
+                else:
+                    if string_dtype is not None:
+                        compact[col] = column.astype(string_dtype)
+                    continue
+
+            if pd.api.types.is_bool_dtype(column):
+                continue
+            elif whole:
+                # Won, break points, rankings, counts, etc.
+                top = column.abs().max()
+                compact[col] = column.astype(
+                    'Int8' if top < 2**7 else 'Int16' if top < 2**15
+                    else 'Int32' if top < 2**31 else 'Int64')
+            elif pd.api.types.is_float_dtype(column):
+                compact[col] = column.astype(np.float32)
+
+        return data.assign(**compact)
+
+    @staticmethod
+    def align_dtypes(frames):
+        '''
+        Return versions of several match data DataFrames (e.g., from separate
+        date windows) whose shared columns have the same dtypes, so they can
+        be joined without mixing types. Each column takes the dtype it has in
+        the first frame where it holds any values, or in a later one if some
+        frame's values don't fit; frames where it's empty adopt it.
+
+        Arguments
+        ---------
+
+        frames : list of pandas.DataFrame, required
+            DataFrames from merge_and_edit_tables(), like self.match_data.
+        '''
+        shared = set.intersection(*[set(fr.columns) for fr in frames])
+        retyped = [{} for _ in frames]
+
+        for col in [cl for cl in frames[0].columns if cl in shared]:
+            dtypes = [fr[col].dtype for fr in frames]
+            if all(dt == dtypes[0] for dt in dtypes):
+                continue
+
+            # (object always works, so it's the last resort)
+            choices = [fr[col].dtype for fr in frames if fr[col].notna().any()]
+            for dtype in choices + [np.dtype(object)]:
+                try:
+                    columns = [fr[col].astype(dtype) for fr in frames]
+                except (TypeError, ValueError):
+                    continue
+                for rt, column in zip(retyped, columns):
+                    rt[col] = column
+                break
+
+        return [fr.assign(**rt) if rt else fr
+                for fr, rt in zip(frames, retyped)]
+
+    @classmethod
+    def batch(cls, specs, **kwargs):
+        '''
+        Run many queries concurrently. A shortcut for BatchDownloader(); see
+        its docstring for the accepted arguments.
+        '''
+        return BatchDownloader(specs, **kwargs)
+
+    @staticmethod
+    def _validate_tour(tour, url):
         '''
         If the user provided a `name` in self.__init__(), ensure that they also
         provided a valid tour. If they provided a `url` instead, infer the tour
@@ -251,7 +910,8 @@ class DownloadStats:
 
         return tour
 
-    def merge_and_edit_tables(self, html_tables):
+    @staticmethod
+    def merge_and_edit_tables(html_tables):
         '''
         Convert a query's resulting match data table into a final pandas
         DataFrame that's ready to be handed off to the user.
@@ -265,38 +925,46 @@ class DownloadStats:
         ---------
 
         html_tables : list, required
-            A list of HTML tables retrieved from the query.
+            A list of HTML tables retrieved from the query, or of dicts of
+            their cells from QueryData(extract='json').
         '''
-        # ensure that we received tables -- if not, report what happened
-        test = BeautifulSoup(html_tables[0], features='lxml')
-        #if (test is None) or (test.contents == []):
-        if test.contents == []:
+        # split HTML tables into cells in one streaming pass, which also
+        # tells whether we received tables -- if not, report what happened
+        with get_tracer().span('parse_table'):
+            tables = [tab if isinstance(tab, dict) else parse_table(tab)
+                      for tab in html_tables]
+        test = tables[0]
+        blank = test is None
+        no_matches = not blank and test['note']
+        no_table = not blank and not (test['header'] or test['rows'])
+
+        if blank:
             raise ValueError(
                 'Your query returned a blank page. The package likely '
                 'produced an invalid URL. Try another search and open an '
                 'issue about these filters in the repository, if you may.')
-        elif test.find('p'):
-            raise ValueError('Your filters produced no matches. '
-                             'Try making them less stringent?')
-        elif not test.find('table'):
+        elif no_matches:
+            raise NoMatchesError('Your filters produced no matches. '
+                                 'Try making them less stringent?')
+        elif no_table:
             raise ValueError(
                 'Unexpected result on website. Something likely failed '
                 'inside this package. Try a different query and open an '
                 'issue about these filters in the repository, if you may.')
 
-        # convert the table html strings into (at least two) DataFrames
-        table_dfs = [pd.read_html(tab).pop() for tab in html_tables]
+        # convert the tables into (at least two) DataFrames
+        table_dfs = [_table_to_frame(tab) for tab in tables]
 
-        # merge the DataFrames. pd.merge only takes two, so if there are more,
-        # use ft.reduce to chain the calls and partial to set kwargs
-        data = ft.reduce(ft.partial(pd.merge, how='inner'), table_dfs)
+        # merge the DataFrames. every view lists the same matches in the same
+        # order, so line them up by position instead of joining on values
+        with get_tracer().span('join views'):
+            data = _concat_views(table_dfs)
         data = data.iloc[:-1] # last row has an unneeded link
 
         # if necessary, drop "Live Scores" row for scheduled, unplayed matches
         data = data.iloc[1:] if data['Score'][0] == 'Live Scores' else data
 
         # format NaNs consistently, including other null patterns
-        data.fillna(np.nan)
         data = data.replace(['^-$', r'-.*\(\d*/\d*\)'], np.nan, regex=True)
 
         # give name to results column
@@ -305,32 +973,37 @@ class DownloadStats:
                                                     'might have changed')
         data = data.rename(columns={result_col_og: 'Result'})
 
+        # build every new or converted column first, then put them in place
+        # with a single reorder/rename at the end instead of copying each time
+        new_data = {}
+        new_names = {}
+        all_cols = list(data.columns)
+
         # add a column to note whether the match was a win or loss
         # (if 'd.' comes before the country code, it's a win)
-        won = (lambda val: (1 if re.search(r'd\.', val).span()[0]
-                            < re.search(r'\[.*\]', val).span()[0]
-                            else 0))
+        result = data['Result']
+        defeated = result.str.find('d.')
+        country = result.str.find('[')
+        # (missing results come back as NaN, which fails both comparisons)
+        unreadable = ~((defeated >= 0) & (country >= 0))
+        if unreadable.any():
+            raise ValueError("Unexpected 'Result' string "
+                             f"{result[unreadable].iloc[0]!r}; the site's "
+                             'format might have changed')
+        new_data['Won'] = (defeated < country).astype(np.int64)
         # what about special cases?
         #walkover = [st.span()[-1] for st in re.finditer('W/O', result)]
         #retired...
-        # need to account for failed searches... think about how
-        #raise ValueError("Unexpected 'Result' string; "...)
-
-        data['Won'] = data['Result'].apply(won)
 
         # move it beside the 'Score' column
-        all_cols = list(data.columns)
-        score_at = all_cols.index('Score')
-        all_cols.insert(score_at, all_cols.pop())
-
-        data = data[all_cols]
+        all_cols.insert(all_cols.index('Score'), 'Won')
 
         # change type of 'Date' column from str to actual dates/Timestamps
-        data['Date'] = data['Date'].apply(lambda d:
-                                          pd.to_datetime(d.replace('‑', '-'),
-                                                         format='%d-%b-%Y'))
         # (the dates in the downloaded table use ‑/U+2011 instead of -/U+002D as
         #  hyphens, so need to replace those before attempting the conversion)
+        new_data['Date'] = pd.to_datetime(data['Date'].str.replace('‑', '-',
+                                                                   regex=False),
+                                          format='%d-%b-%Y')
 
         # change dtype of columns w/ percentages as strings
         for col in data.columns:
@@ -344,87 +1017,207 @@ class DownloadStats:
             elif isinstance(examp, str) and examp[-1] == '%':
                 # convert values. throw out those below 0 or above 100
                 # (slicing by [:-1] removes index with '%')
-                data[col] = data[col].apply(lambda val: float(val[:-1])
-                                            if pd.notnull(val)
-                                            and 0 <= float(val[:-1]) <= 100
-                                            else np.nan)
-
-                # ensure that column dtype has changed
-                data = data.astype({col: np.float64})
+                pcts = pd.to_numeric(data[col].str[:-1], errors='coerce')
+                new_data[col] = pcts.where(pcts.between(0, 100)).astype(
+                                                                    np.float64)
 
                 # add pct sign to these columns' names if it isn't present
                 if col[-1] != '%':
-                    data = data.rename(columns={col: col + '%'})
+                    new_names[col] = col + '%'
             elif isinstance(examp, float):
                 # if all floats in the col could be ints, make it an int column
-                if all(en.is_integer() for en in valid_entries):
-                    data = data.astype({col: pd.Int64Dtype()})
+                if (valid_entries % 1 == 0).all():
+                    new_data[col] = data[col].astype(pd.Int64Dtype())
 
         # split each break point column into two:
         # BPCo(n)v & BPS(a)v(e)d into Brks/BPForced & Brkn/BPFaced
-        bp_cols = (col for col in data.columns if col.startswith('BP'))
+        bp_cols = [col for col in data.columns if col.startswith('BP')]
 
-        for col, col_data in data[bp_cols].iteritems():
+        for col in bp_cols:
             # set names for new columns based on current, "old" BP column
             new_cols = (['Brkn', 'BPFaced'] if re.match('BPSa?ve?d', col)
                         else ['Brks', 'BPForced'] if re.match('BPCo?nv', col)
                         else [])
 
             if new_cols:
-                # save split version of BP column to be updated later
-                # (format is 'NN.N% (Y/Z)'; split to get Y and Z)
-                bp_info = col_data.apply(lambda vals: vals.split()[-1]
-                                         if pd.notnull(vals) else np.nan)
-
-                # add new columns in same order as Y and Z, ensuring type
+                # pull Y and Z out of the format 'NN.N% (Y/Z)', ensuring type
+                bp_info = data[col].str.extract(r'\((\d+)/(\d+)\)\s*$')
                 for i, c in enumerate(new_cols):
-                    data[c] = bp_info.apply(lambda val:
-                                            int(re.findall(r'\d+', val)[i])
-                                            if pd.notnull(val) else np.nan)
-                    data = data.astype({c: pd.Int64Dtype()})
+                    new_data[c] = pd.to_numeric(bp_info[i]).astype(
+                                                               pd.Int64Dtype())
 
-                # move new columns beside predecessor BP column; drop the latter
-                all_cols = list(data.columns)
+                # put new columns where the predecessor BP column was
                 old_col_at = all_cols.index(col)
-                all_cols = (all_cols[:old_col_at] + new_cols
-                            + all_cols[old_col_at+1 : -len(new_cols)])
-                data = data[all_cols]
+                all_cols[old_col_at : old_col_at+1] = new_cols
             else:
                 warnings.warn(f"Unexpected break point column name '{col}'")
 
-        # finish changing 'BPSaved' to 'Brkn' (i.e., 'BPLost')
-        data['Brkn'] = data['BPFaced'] - data['Brkn']
+        # change 'BPSaved' to 'Brkn' (i.e., 'BPLost')
+        if 'Brkn' in new_data:
+            new_data['Brkn'] = new_data['BPFaced'] - new_data['Brkn']
 
-        # change dtypes of as of yet untouched 'object' type columns
-        oth_cols = (col for col in data.columns
-                    if data[col].dtype == np.dtype('O'))
-        oth_col_types = []
+        # assemble the final table in one pass
+        data = data.assign(**new_data)[all_cols].rename(columns=new_names)
 
-        for col in oth_cols:
-            valid_entries = data[col].dropna()
-            examp = (valid_entries.iloc[0]
-                     if valid_entries.size > 0 else '')
+        # stretch: if most stat cols in a row are NaN make all stat entries in
+        # that row NaN?
 
-            if examp:
-                # if examp is a number, type it as a float or int
-                try:
-                    oth_type = (pd.Int64Dtype()
-                                if all(en.is_integer() for en in valid_entries)
-                                else np.float64)
-                # if examp is not a number, type it as a str
-                except AttributeError:
-                    oth_type = pd.StringDtype()
+        return data
+
+def _table_to_frame(table):
+    '''
+    Convert one table's cells (from parse_table() or QueryData(extract='json'))
+    into a DataFrame. They go through the same text parser (and default
+    options) that pd.read_html() uses, so the results match what it would give
+    for the tables' HTML.
+    '''
+    # pad ragged rows, as read_html does
+    rows = [table['header']] + table['rows']
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+
+    return TextParser(rows, header=0, thousands=',').read()
+
+def _concat_views(table_dfs, keys=('Date', 'Unnamed: 6')):
+    '''
+    Put the stat views' DataFrames side by side, keeping the columns they
+    share (date, tournament, opponent, score, etc.) from the first view only.
+    Unlike joining on those columns, this can't drop or duplicate rows when
+    two matches happen to share their values.
+
+    Raises a ValueError if the views' lengths or `keys` columns disagree, as
+    that means they aren't listing the same matches.
+    '''
+    first, seen = table_dfs[0], set(table_dfs[0].columns)
+    parts = [first]
+
+    for df in table_dfs[1:]:
+        if len(df) != len(first) or not all(
+                df[key].equals(first[key]) for key in keys if key in seen):
+            raise ValueError(
+                "The page's stat views don't list the same matches. Try your "
+                'query again and open an issue in the repository if it '
+                'persists, if you may.')
+
+        new_cols = [col for col in df.columns if col not in seen]
+        seen.update(new_cols)
+        parts.append(df[new_cols])
+
+    return pd.concat(parts, axis=1, copy=False)
+
+class BatchDownloader:
+    '''
+    Runs many DownloadStats() queries concurrently over a shared pool of
+    headless browsers, so a long list of players doesn't have to be fetched
+    one at a time.
+
+    Saves the outcome of each query in self.results, a list in the same order
+    as `specs` that holds a DownloadStats instance for each successful query
+    and None for each failed one. Failures don't stop the rest of the batch;
+    their exceptions are saved in the self.errors dict, keyed by the failed
+    spec's index.
+
+    Arguments
+    ---------
+
+    specs : list of dict, required
+        Each dict holds the DownloadStats() arguments for one query -- either
+        'name', 'tour', and (optionally) 'attrs', or just 'url'.
+
+    workers : int, optional
+        The number of queries to run at once. Each worker gets its own browser
+        in the batch's DriverPool. [default: 4]
+
+    browser : str, optional
+        The browser that selenium will drive headlessly to the relevant URLs.
+        For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
+
+    timeout : float or None, optional
+        How long (in seconds) a single query may run before it's recorded as a
+        TimeoutError. Python threads can't be interrupted, so a timed-out query
+        keeps its worker (and the batch's browsers stay open) until it
+        finishes, but its result is discarded. No limit if None.
+        [default: None]
+
+    lean : boolean, optional
+        Whether the batch's browsers use the lean profile that skips images,
+        stylesheets, fonts, and trackers (see execute_query.DriverPool).
+        [default: False]
+    '''
+    # arguments that the batch sets for every query
+    SHARED_KEYS = {'browser', 'pool'}
+
+    def __init__(self, specs, workers=4, browser='chromium', timeout=None,
+                 lean=False):
+        self.specs = list(specs)
+        self.results = [None] * len(self.specs)
+        self.errors = {}
+
+        for i, spec in enumerate(self.specs):
+            shared = sorted(self.SHARED_KEYS.intersection(spec))
+            if shared:
+                raise ValueError(
+                    f"Spec {i} sets {', '.join(map(repr, shared))}, which the "
+                    'batch sets for every query. Pass `browser` to '
+                    'BatchDownloader() instead.')
+
+        # give each worker a browser of its own
+        pool = DriverPool(browser, size=workers, lean=lean)
+        self._started = {}
+
+        executor = cf.ThreadPoolExecutor(max_workers=workers)
+        futures = {}
+        try:
+            futures = {executor.submit(self._run, i, spec, browser, pool): i
+                       for i, spec in enumerate(self.specs)}
+            self._collect(futures, timeout)
+        finally:
+            # don't wait on queries that timed out; they finish in background.
+            # since they may still need browsers, only close the pool after
+            running = [fut for fut in futures
+                       if not fut.cancel() and not fut.done()]
+            executor.shutdown(wait=False)
+            if running:
+                threading.Thread(target=self._close_after,
+                                 args=(running, pool), daemon=True).start()
             else:
-                # if column is all NaNs, don't change its dtype
-                oth_type = np.dtype('O')
+                pool.close()
 
-            # add this column's adjusted type to the list
-            oth_col_types.append(oth_type)
+    @staticmethod
+    def _close_after(futures, pool):
+        cf.wait(futures)
+        pool.close()
 
-        # assign the new dtypes
-        data = data.astype(dict(zip(oth_cols, oth_col_types)))
+    def _run(self, i, spec, browser, pool):
+        self._started[i] = time.monotonic()
+        return DownloadStats(**spec, browser=browser, pool=pool)
 
-        # stretch: if most stat cols in a row are NaN make all stat entries in
-        # that row NaN?
+    def _collect(self, futures, timeout):
+        '''
+        Gather results as queries finish, recording errors (and, if `timeout`
+        is set, queries that have run too long) without stopping the batch.
+        '''
+        pending = set(futures)
 
-        return data
+        while pending:
+            done, pending = cf.wait(pending, timeout=.5 if timeout else None,
+                                    return_when=cf.FIRST_COMPLETED)
+
+            for fut in done:
+                i = futures[fut]
+                try:
+                    self.results[i] = fut.result()
+                except Exception as e:
+                    self.errors[i] = e
+
+            if timeout is None:
+                continue
+
+            # give up on queries that have been running for too long
+            now = time.monotonic()
+            for fut in list(pending):
+                i = futures[fut]
+                if i in self._started and now - self._started[i] > timeout:
+                    self.errors[i] = TimeoutError(
+                        f"Query {i} took longer than {timeout} seconds.")
+                    pending.discard(fut)
@@ -1,18 +1,63 @@
+import asyncio
+import atexit
+import concurrent.futures as cf
+import contextlib
+import contextvars
 import functools as ft
+import gzip
+import hashlib
+import html
+import http.client
+import io
+import itertools
+import json
+import os
+import queue
 import re
 import selenium.common.exceptions as selexcept
 import sys
+import threading
+import time
 import unicodedata
+import urllib.parse
+import weakref
 
 from better_abc import ABC, abstractmethod#, abstract_attribute
 #from collections import Counter
+from parse_tables import parse_table
+from player_index import PlayerIndex
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+from tracing import get_tracer
 
+try:
+    import fcntl
+except ImportError: # not on POSIX systems
+    fcntl = None
 
 HOME_URL = 'http://www.tennisabstract.com/'
+# where the package keeps data it saves between sessions
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ipa-sba-sinnet')
+
+# requests that a lean browser skips, since the match data table doesn't need
+# them. (jQuery and the site's own scripts must still load.)
+LEAN_BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico',
+                     '*.webp', '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf',
+                     '*google-analytics.com*', '*googletagmanager.com*',
+                     '*doubleclick.net*', '*googlesyndication.com*',
+                     '*quantserve.com*', '*scorecardresearch.com*',
+                     '*facebook.net*', '*twitter.com/widgets*']
+LEAN_CHROME_PREFS = {'profile.managed_default_content_settings.images': 2,
+                     'profile.managed_default_content_settings.stylesheets': 2,
+                     'profile.managed_default_content_settings.fonts': 2,
+                     'profile.managed_default_content_settings.plugins': 2,
+                     'profile.managed_default_content_settings.media_stream': 2}
+LEAN_FIREFOX_PREFS = {'permissions.default.image': 2,
+                      'permissions.default.stylesheet': 2,
+                      'browser.display.use_document_fonts': 0,
+                      'media.autoplay.default': 5,
+                      'privacy.trackingprotection.enabled': True}
 
 class LoadAndInteract(ABC):
     '''
@@ -35,38 +80,69 @@ class LoadAndInteract(ABC):
         The browser that selenium will drive headlessly to the relevant URL.
         For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
 
-    load_images : boolean, required [DEPRECATED?]
-        When False, prevents images on the target webpage from loading, which
-        *should* decrease wait times. Need to determine whether this is possible...
-
     verbose : boolean, optional
-        Controls whether or not to print debugging information. [default: False]
+        Controls whether or not to print the timing of each stage of the page
+        load and interaction as it finishes. (The timings are saved in
+        self.timings either way.) [default: False]
+
+    pool : DriverPool or None, optional
+        The pool from which to borrow an already-running WebDriver instance.
+        If None, uses the shared pool for `browser` from get_pool(). When a
+        pool is provided, its own `browser` takes precedence. [default: None]
+
+    wait : WaitPolicy or None, optional
+        How long and how often to check for expected changes on the page, and
+        how many times to reload it if one doesn't arrive in time. If None,
+        uses a WaitPolicy() with its default settings. [default: None]
     '''
-    def __init__(self, url, browser, verbose=False):#, load_images):
-        self._vb = verbose
-
-        # create the WebDriver instance used to browse
-        driver = self.choose_browser(browser)
-
-        # how long (in seconds) to wait for actions on the page to execute
-        bide = WebDriverWait(driver, 5)
-        # PERHAPS WAIT TIME SHOULD BE A KWARG?
+    # (children that skip loading a page still need a value for self._span())
+    _vb = False
+    timings = None
 
-        # load and interact with the page; close connection on completion/error
-        self._pr('LoadAndInteract')
-        driver.get(url)
-        try:
-            self.interact(driver, bide)
-        except Exception as e:
-            driver.close()
-            raise e
-        else:
-            driver.close()
-
-    def _pr(self, *args, **kwargs):
-        print(*args, **kwargs) if self._vb else None
+    def __init__(self, url, browser, verbose=False, pool=None, wait=None):
+        self._vb = verbose
 
-    def choose_browser(self, browser):
+        # borrow a WebDriver instance from a pool of running browsers (the pool
+        # launches one if none are idle) instead of starting a new one
+        pool = get_pool(browser) if pool is None else pool
+        wait = WaitPolicy() if wait is None else wait
+
+        # load and interact with the page; return the driver on completion/error
+        # (timing each stage in self.timings)
+        with self._span(type(self).__name__, url=url) as self.timings:
+            with pool.driver() as driver:
+                # sets timers ('bides time') on expected events on the page
+                bide = wait.bind(driver)
+
+                # a slow page gets a fresh start (interact() resets results)
+                for attempt in range(wait.retries + 1):
+                    try:
+                        with self._span('driver.get', attempt=attempt):
+                            driver.get(url)
+                        with self._span('interact'):
+                            self.interact(driver, bide)
+                        break
+                    except selexcept.TimeoutException:
+                        if attempt == wait.retries:
+                            raise
+                        self.timings.attrs['reloads'] = attempt + 1
+
+    @contextlib.contextmanager
+    def _span(self, name, **attrs):
+        # time a stage of the work, printing its timing if verbose
+        with get_tracer().span(name, **attrs) as span:
+            yield span
+        if self._vb:
+            print(span)
+
+    @staticmethod
+    def choose_browser(browser, lean=False):
+        '''
+        Launch a headless WebDriver instance of `browser`. If `lean` is True,
+        the browser doesn't wait for or download images, stylesheets, fonts,
+        or third-party trackers (see LEAN_BLOCKED_URLS and the LEAN_*_PREFS),
+        and page loads return once the page's HTML is parsed.
+        '''
         if browser == 'chromium':
             from selenium.webdriver.chrome.options import Options
             Driver = webdriver.Chrome
@@ -82,9 +158,25 @@ class LoadAndInteract(ABC):
         options.add_argument('--headless')
         options.add_argument('--disable-extensions')
 
+        if lean:
+            # children of this class wait for the elements they need anyway
+            options.set_capability('pageLoadStrategy', 'eager')
+            if browser == 'chromium':
+                options.add_experimental_option('prefs', LEAN_CHROME_PREFS)
+            else:
+                for key, val in LEAN_FIREFOX_PREFS.items():
+                    options.set_preference(key, val)
+
         # create the WebDriver instance used to browse
         driver = Driver(options=options)
         driver.set_window_size(1440, 810)
+
+        if lean and browser == 'chromium':
+            # prefs can't stop requests by URL, but the devtools protocol can
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs',
+                                   {'urls': LEAN_BLOCKED_URLS})
+
         return driver
 
     @abstractmethod
@@ -100,12 +192,441 @@ class LoadAndInteract(ABC):
             An object that begins a FireFox browsing session and can send
             commands to the queried webpage.
 
-        bide : selenium.webdriver.support.wait.WebDriverWait, required
-            A constructor that sets a timer ('bides time') on an expected
-            webpage event and throws an error if it doesn't occur.
+        bide : PolicyWait, required
+            Sets a timer ('bides time') on an expected webpage event and
+            throws a TimeoutException if it doesn't occur. Its until() method
+            works like selenium's WebDriverWait.until().
         '''
         pass
 
+class DriverPool:
+    '''
+    Keeps a bounded set of headless WebDriver instances alive between page
+    loads so that NameCheck, QueryData, and any other child of LoadAndInteract
+    can reuse them instead of launching a new browser for every page.
+
+    Drivers are borrowed with self.checkout() and returned with self.checkin()
+    (or both at once with the self.driver() context manager). Idle drivers are
+    health-checked before they're handed out again, and each one is quit and
+    replaced after loading `max_uses` pages so that long-lived browsers don't
+    accumulate memory. All pools created by get_pool() are closed when the
+    interpreter exits.
+
+    Arguments
+    ---------
+
+    browser : str, optional
+        The browser that selenium will drive headlessly. For now, choose
+        between 'chromium' and 'firefox'. [default: 'chromium']
+
+    size : int, optional
+        The maximum number of browsers the pool will have open at once. Callers
+        that ask for a driver while all of them are busy wait until one is
+        returned. [default: 2]
+
+    max_uses : int, optional
+        The number of pages a driver may load before it's quit and replaced.
+        [default: 50]
+
+    timeout : float or None, optional
+        How long (in seconds) self.checkout() waits for a free driver before
+        raising a TimeoutError. Waits indefinitely if None. [default: None]
+
+    lean : boolean, optional
+        Whether to launch browsers that skip images, stylesheets, fonts, and
+        trackers and stop waiting on page loads once the HTML is parsed (see
+        LoadAndInteract.choose_browser()). [default: False]
+    '''
+    def __init__(self, browser='chromium', size=2, max_uses=50, timeout=None,
+                 lean=False):
+        if size < 1:
+            raise ValueError('`size` must be at least 1.')
+
+        self.browser = browser
+        self.lean = lean
+        self.size = size
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.closed = False
+
+        # idle drivers (most recently returned first, so warm ones are reused)
+        self._idle = queue.LifoQueue()
+        # one slot per driver that's currently checked out
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        # per-event loop counterparts of self._slots for self.run_in_thread()
+        self._async_slots = weakref.WeakKeyDictionary()
+
+    def checkout(self):
+        '''
+        Hand out a healthy, idle WebDriver instance, launching a new one if
+        none are available and the pool isn't yet at its size limit. Blocks
+        while every driver is in use.
+        '''
+        if self.closed:
+            raise RuntimeError('This DriverPool has already been closed.')
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No {self.browser} driver became available "
+                               f"within {self.timeout} seconds.")
+
+        try:
+            # prefer an idle driver, discarding any that have stopped responding
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    driver = None
+                    break
+
+                if self._is_healthy(driver):
+                    break
+                self._discard(driver)
+
+            if driver is None:
+                with get_tracer().span('choose_browser', browser=self.browser,
+                                       lean=self.lean):
+                    driver = LoadAndInteract.choose_browser(self.browser,
+                                                            lean=self.lean)
+                with self._lock:
+                    self._uses[id(driver)] = 0
+        except Exception:
+            self._slots.release()
+            raise
+
+        return driver
+
+    def checkin(self, driver, healthy=True):
+        '''
+        Return a driver from self.checkout() to the pool. It's quit instead of
+        kept if it's marked unhealthy, has reached `max_uses`, or if the pool
+        has been closed in the meantime.
+
+        Arguments
+        ---------
+
+        driver : selenium.webdriver.remote.webdriver.WebDriver, required
+            The driver being returned.
+
+        healthy : boolean, optional
+            Whether the driver is fit for reuse. [default: True]
+        '''
+        try:
+            with self._lock:
+                self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+                worn_out = self._uses[id(driver)] >= self.max_uses
+
+            if not healthy or worn_out or self.closed:
+                self._discard(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def driver(self):
+        '''
+        Check out a driver for the duration of a `with` block and return it
+        afterward. Drivers that raise selenium errors are recycled rather than
+        reused, since the browser may be in a bad state.
+        '''
+        # (includes any time spent waiting for a free driver)
+        with get_tracer().span('checkout', browser=self.browser):
+            driver = self.checkout()
+        try:
+            yield driver
+        except selexcept.WebDriverException:
+            self.checkin(driver, healthy=False)
+            raise
+        except BaseException:
+            self.checkin(driver)
+            raise
+        else:
+            self.checkin(driver)
+
+    async def run_in_thread(self, func, *args, **kwargs):
+        '''
+        Await `func(*args, **kwargs)` from an asyncio event loop by running it
+        in a worker thread. At most `size` calls run at once, so coroutines
+        waiting for a free browser wait on the event loop instead of tying up
+        threads that would only block in self.checkout().
+
+        Arguments
+        ---------
+
+        func : callable, required
+            The blocking function to run (e.g., QueryData or NameCheck).
+
+        *args, **kwargs
+            Passed on to `func`.
+        '''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.get(loop)
+            if slots is None:
+                slots = self._async_slots[loop] = asyncio.Semaphore(self.size)
+
+        async with slots:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    def close(self):
+        '''
+        Quit every idle driver. Drivers that are still checked out are quit
+        when they're returned.
+        '''
+        self.closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _is_healthy(self, driver):
+        # any response from the browser means the session is still alive
+        try:
+            driver.current_url
+        except selexcept.WebDriverException:
+            return False
+        return True
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            # the browser may already be gone; nothing else to clean up
+            pass
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(browser='chromium', lean=False):
+    '''
+    Return the shared DriverPool for `browser` and `lean`, creating it on
+    first use (or if the previous one was closed).
+
+    Arguments
+    ---------
+
+    browser : str, optional
+        The browser that selenium will drive headlessly. For now, choose
+        between 'chromium' and 'firefox'. [default: 'chromium']
+
+    lean : boolean, optional
+        Whether the pool's browsers use the lean profile described in
+        DriverPool. [default: False]
+    '''
+    with _POOLS_LOCK:
+        pool = _POOLS.get((browser, lean))
+        if pool is None or pool.closed:
+            pool = _POOLS[(browser, lean)] = DriverPool(browser, lean=lean)
+    return pool
+
+@atexit.register
+def close_pools():
+    '''
+    Close every shared DriverPool (and the shared HTTPPool's connections). Runs
+    automatically at interpreter exit so no headless browsers are left behind.
+    '''
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
+
+    _HTTP_POOL.close()
+
+class SingleFlight:
+    '''
+    Coalesces concurrent identical calls so only one of them does the work.
+    While a call for a given key is in flight, other calls for the same key
+    (from any thread, or any coroutine with arun()) wait for it and receive
+    its result -- or its exception -- instead of repeating it.
+
+    With a `lock_dir`, the leading call for each key also holds a file lock
+    while it runs, so calls from other processes that share the directory
+    wait their turn. (They don't receive the result directly; callers should
+    check a shared store, like a ResponseCache, once they hold the lock.)
+
+    Arguments
+    ---------
+
+    lock_dir : str or None, optional
+        The directory for cross-process lock files. Only coalesces calls
+        within this process if None. Needs a POSIX system. [default: None]
+    '''
+    def __init__(self, lock_dir=None):
+        if lock_dir is not None:
+            if fcntl is None:
+                raise ValueError('Cross-process locks need a POSIX system. '
+                                 'Try lock_dir=None instead.')
+            os.makedirs(lock_dir, exist_ok=True)
+
+        self.lock_dir = lock_dir
+        self.shared = 0 # the number of calls that joined another's flight
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        # return the key's in-flight future and whether this call leads it
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.shared += 1
+                return fut, False
+
+            fut = self._calls[key] = cf.Future()
+            return fut, True
+
+    def _land(self, key, fut, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+
+        if error is None:
+            fut.set_result(result)
+        else:
+            fut.set_exception(error)
+
+    def _acquire(self, key):
+        if self.lock_dir is None:
+            return None
+
+        name = hashlib.sha1(key.encode()).hexdigest() + '.lock'
+        file = open(os.path.join(self.lock_dir, name), 'a')
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+    def _release(self, file):
+        if file is not None:
+            fcntl.flock(file, fcntl.LOCK_UN)
+            file.close()
+
+    def run(self, key, func, *args, **kwargs):
+        '''
+        Return `func(*args, **kwargs)`, or the result of the identical call
+        that's already in flight for `key`.
+
+        Arguments
+        ---------
+
+        key : str, required
+            Identifies calls that would return the same result.
+
+        func : callable, required
+            The function to call if no call for `key` is in flight.
+        '''
+        fut, leader = self._join(key)
+        if not leader:
+            with get_tracer().span('wait for flight', key=key):
+                return fut.result()
+
+        try:
+            file = self._acquire(key)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self._release(file)
+        except BaseException as e:
+            self._land(key, fut, error=e)
+            raise
+
+        self._land(key, fut, result)
+        return result
+
+    async def arun(self, key, func, *args, **kwargs):
+        '''
+        The asyncio counterpart of self.run(). `func` is a coroutine function,
+        and waiting (for other calls or the file lock) doesn't block the event
+        loop.
+        '''
+        fut, leader = self._join(key)
+        if not leader:
+            with get_tracer().span('wait for flight', key=key):
+                return await asyncio.wrap_future(fut)
+
+        try:
+            file = await asyncio.to_thread(self._acquire, key)
+            try:
+                result = await func(*args, **kwargs)
+            finally:
+                self._release(file)
+        except BaseException as e:
+            self._land(key, fut, error=e)
+            raise
+
+        self._land(key, fut, result)
+        return result
+
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+def get_flight(lock_dir=None):
+    '''
+    Return the shared SingleFlight that uses `lock_dir`, creating it on first
+    use.
+
+    Arguments
+    ---------
+
+    lock_dir : str or None, optional
+        As in SingleFlight(). [default: None]
+    '''
+    with _FLIGHTS_LOCK:
+        if lock_dir not in _FLIGHTS:
+            _FLIGHTS[lock_dir] = SingleFlight(lock_dir)
+    return _FLIGHTS[lock_dir]
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(path=None):
+    '''
+    Return the shared PlayerIndex saved at `path`, loading it from disk on
+    first use.
+
+    Arguments
+    ---------
+
+    path : str or None, optional
+        The index's JSON file. If None, uses 'players.json' in CACHE_DIR.
+        [default: None]
+    '''
+    path = os.path.join(CACHE_DIR, 'players.json') if path is None else path
+    with _INDEXES_LOCK:
+        if path not in _INDEXES:
+            _INDEXES[path] = PlayerIndex(path)
+    return _INDEXES[path]
+
+def refresh_index(index=None, url=HOME_URL, browser='chromium', pool=None):
+    '''
+    Load Tennis Abstract's full player list into a PlayerIndex (the shared one
+    if `index` is None) and save it, after which NameCheck() can resolve any
+    name without opening a browser.
+
+    Arguments
+    ---------
+
+    index : player_index.PlayerIndex or None, optional
+        The index to fill. If None, uses get_index(). [default: None]
+
+    url : str, optional
+        The URL of the site's homepage.
+        [default: 'http://www.tennisabstract.com/']
+
+    browser : str, optional
+        The browser that selenium will drive headlessly to the relevant URL.
+        For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
+
+    pool : DriverPool or None, optional
+        The pool from which to borrow a WebDriver instance. If None, uses the
+        shared pool for `browser`. [default: None]
+    '''
+    index = get_index() if index is None else index
+    index.replace_all(PlayerList(url, browser, pool=pool).labels)
+    index.save()
+    return index
+
 class AwaitJSCondition:
     '''
     Serves as an argument for bide.until() (bide is a selenium WebDriverWait
@@ -122,16 +643,197 @@ class AwaitJSCondition:
         write them as 'arguments[i]', with i being the index of the matching
         `entry` argument (starting from 0).
 
-    entry : str, required [SHOULD BE ABLE TO TAKE ANY NUMBER OF ARGUMENTS]
-        An object to insert into `js` when it's time to execute the JavaScript
-        code.
+    *entries : optional
+        The objects to insert into `js` when it's time to execute the
+        JavaScript code.
     '''
-    def __init__(self, js, entry):
+    def __init__(self, js, *entries):
         self.js = js
-        self.entry = entry
+        self.entries = entries
 
     def __call__(self, driver):
-        return driver.execute_script(self.js, self.entry)
+        return driver.execute_script(self.js, *self.entries)
+
+class WaitPolicy:
+    '''
+    Decides how LoadAndInteract's children wait for changes on a page. Checks
+    start out frequent and back off, so a condition that's met quickly is
+    noticed almost right away while a slow one isn't polled wastefully.
+    JavaScript conditions can instead be watched from inside the page with a
+    MutationObserver, which answers as soon as the DOM changes.
+
+    If a wait runs out of time, the page is reloaded and the interaction is
+    repeated from the start up to `retries` times before the TimeoutException
+    is raised.
+
+    Arguments
+    ---------
+
+    timeout : float, optional
+        How long (in seconds) to wait for a condition. [default: 5]
+
+    timeouts : dict or None, optional
+        Timeouts for specific kinds of conditions that override `timeout`,
+        keyed by name. The built-in names are 'load' (the page's first
+        elements), 'search' (NameCheck's search suggestions), and 'toggle'
+        (QueryData's table views). [default: None]
+
+    poll : float, optional
+        The first interval (in seconds) between checks. [default: 0.02]
+
+    backoff : float, optional
+        The factor by which the interval grows after each failed check.
+        [default: 1.5]
+
+    max_poll : float, optional
+        The longest interval (in seconds) between checks. [default: 0.5]
+
+    retries : int, optional
+        How many times to reload the page after a wait times out.
+        [default: 1]
+
+    observe : boolean, optional
+        Whether to watch JavaScript conditions with a MutationObserver instead
+        of polling them. [default: True]
+    '''
+    def __init__(self, timeout=5, timeouts=None, poll=.02, backoff=1.5,
+                 max_poll=.5, retries=1, observe=True):
+        if poll <= 0 or backoff < 1:
+            raise ValueError('`poll` must be positive and `backoff` at least 1.')
+
+        self.timeout = timeout
+        self.timeouts = {} if timeouts is None else dict(timeouts)
+        self.poll = poll
+        self.backoff = backoff
+        self.max_poll = max_poll
+        self.retries = retries
+        self.observe = observe
+
+    def timeout_for(self, name=None):
+        '''
+        Return the timeout for conditions of the kind `name`.
+        '''
+        return self.timeouts.get(name, self.timeout)
+
+    def bind(self, driver):
+        '''
+        Return a PolicyWait that applies this policy to `driver`.
+        '''
+        return PolicyWait(self, driver)
+
+class PolicyWait:
+    '''
+    Waits for conditions on one driver's page according to a WaitPolicy. Made
+    by WaitPolicy.bind() and handed to LoadAndInteract.interact() as `bide`.
+
+    Arguments
+    ---------
+
+    policy : WaitPolicy, required
+        The policy to follow.
+
+    driver : selenium.webdriver.remote.webdriver.WebDriver, required
+        The driver whose page is being watched.
+    '''
+    # runs a condition whenever the DOM changes, finishing once it's true or
+    # the time runs out. the condition's code goes in the %s
+    OBSERVE_JS = """
+        var done = arguments[arguments.length - 1];
+        var waitMs = arguments[arguments.length - 2];
+        var args = Array.prototype.slice.call(arguments, 0, -2);
+        var check = function() { %s };
+
+        if (check.apply(null, args)) { done(true); return; }
+
+        var finished = false;
+        function finish(result) {
+            finished = true;
+            observer.disconnect();
+            clearTimeout(timer);
+            done(result);
+        }
+        var observer = new MutationObserver(function() {
+            if (!finished && check.apply(null, args)) { finish(true); }
+        });
+        var timer = setTimeout(function() {
+            finish(!!check.apply(null, args));
+        }, waitMs);
+        observer.observe(document, {childList: true, subtree: true,
+                                    attributes: true, characterData: true});"""
+
+    def __init__(self, policy, driver):
+        self.policy = policy
+        self.driver = driver
+
+    def until(self, condition, message='', name=None):
+        '''
+        Call `condition(driver)` until it returns something truthy, which is
+        then returned. Checks are spaced out by the policy's growing interval.
+        Like WebDriverWait.until(), treats NoSuchElementException as "not
+        yet" and raises a TimeoutException if time runs out.
+
+        Arguments
+        ---------
+
+        condition : callable, required
+            Takes the driver (e.g., a condition from selenium's
+            `expected_conditions` or an AwaitJSCondition).
+
+        message : str, optional
+            The TimeoutException's message. [default: '']
+
+        name : str or None, optional
+            The kind of condition, for per-kind timeouts. [default: None]
+        '''
+        with get_tracer().span('wait', kind=name) as span:
+            policy = self.policy
+            end = time.monotonic() + policy.timeout_for(name)
+            interval = policy.poll
+
+            for checks in itertools.count(1):
+                span.attrs['checks'] = checks
+                try:
+                    value = condition(self.driver)
+                    if value:
+                        return value
+                except selexcept.NoSuchElementException:
+                    pass
+
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise selexcept.TimeoutException(message)
+                time.sleep(min(interval, remaining))
+                interval = min(interval * policy.backoff, policy.max_poll)
+
+    def until_js(self, js, *args, message='', name=None):
+        '''
+        Wait until the JavaScript condition `js` returns true. If the policy
+        allows it, the condition is re-checked in the page every time the DOM
+        changes; otherwise, it's polled like in self.until().
+
+        Arguments
+        ---------
+
+        js : str, required
+            The body of the condition, as in AwaitJSCondition.
+
+        *args : optional
+            Values for the condition's `arguments[i]`.
+
+        message, name : optional
+            As in self.until().
+        '''
+        if not self.policy.observe:
+            return self.until(AwaitJSCondition(js, *args), message, name)
+
+        with get_tracer().span('wait', kind=name, observe=True):
+            timeout = self.policy.timeout_for(name)
+            # leave selenium a little more time than the script's own timer
+            self.driver.set_script_timeout(timeout + 1)
+            if self.driver.execute_async_script(self.OBSERVE_JS % js, *args,
+                                                int(timeout * 1000)):
+                return True
+            raise selexcept.TimeoutException(message)
 
 class NameCheck(LoadAndInteract):
     '''
@@ -167,22 +869,86 @@ class NameCheck(LoadAndInteract):
         The browser that selenium will drive headlessly to the relevant URL.
         For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
 
-    load_images : boolean, optional [DEPCREATED?]
-        When False, prevents images on the target webpage from loading, which
-        *should* decrease wait times. I hope to test whether this is the case.
-        [default: False]
+    pool : DriverPool or None, optional
+        The pool from which to borrow a WebDriver instance. If None, uses the
+        shared pool for `browser`. (Pass `get_pool(browser, lean=True)` to
+        skip loading images and other resources the page doesn't need.)
+        [default: None]
+
+    index : player_index.PlayerIndex, None, or False, optional
+        The local player index to consult before searching on the site. Names
+        that are resolved on the site are written back to it. If None, uses
+        the shared index from get_index() when `url` is the real site's
+        homepage (and no index otherwise, so stand-in servers don't fill it
+        with their players); if False, always uses the site. [default: None]
+
+    search : str, optional
+        How to search the site. 'batch' reads the search bar's data source
+        and matches every name fragment against it in a single script, so the
+        whole name resolves in one round trip; 'sequential' types each
+        fragment into the search bar and waits for its suggestions in turn,
+        like a user would. 'batch' falls back to 'sequential' if the data
+        source can't be read. [default: 'batch']
+
+    wait : WaitPolicy or None, optional
+        How to wait for the search bar and its suggestions. If None, uses a
+        WaitPolicy() with its default settings. [default: None]
     '''
-    # should max_wait (seconds) be an argument?
-    def __init__(self, name, tour, url=HOME_URL, browser='chromium'):#, load_images=False):
+    def __init__(self, name, tour, url=HOME_URL, browser='chromium',
+                 pool=None, index=None, search='batch', wait=None):
+        if search not in {'batch', 'sequential'}:
+            raise ValueError('invalid search. choose "batch" or "sequential".')
+
         self.names = self.ready_names(name)
         self.gender = self.ready_gender(tour)
+        self.search = search
         self.suggestions = []
 
-        # load URL, retrieve matching names
-        super().__init__(url, browser)#, load_images)
-        self.name_str = self.validate_name()
+        # try the local index first; only load URL and retrieve matching names
+        # from the site if the index can't answer
+        if index is None:
+            index = get_index() if url == HOME_URL else False
+        matches = index.lookup(self.names, self.gender) if index else None
+
+        if matches is not None:
+            self.suggestions.append(matches)
+            self.name_str = self.validate_name()
+        else:
+            super().__init__(url, browser, pool=pool, wait=wait)
+            self.name_str = self.validate_name()
+
+            if index:
+                self.update_index(index)
 
-    def ready_names(self, name):
+    @classmethod
+    async def resolve(cls, name, tour, url=HOME_URL, browser='chromium',
+                      pool=None, index=None, search='batch', wait=None):
+        '''
+        The asyncio counterpart of NameCheck(). Takes the same arguments and
+        returns the finished instance; use it as
+        `await NameCheck.resolve(name, tour)`.
+
+        Names that the local index can answer are resolved right away. Others
+        are searched on the site in a worker thread once one of `pool`'s
+        browsers is free (see DriverPool.run_in_thread()), so the event loop
+        never waits on the page.
+        '''
+        names = cls.ready_names(name)
+        gender = cls.ready_gender(tour)
+
+        if index is None:
+            index = get_index() if url == HOME_URL else False
+        if index and index.lookup(names, gender) is not None:
+            return cls(name, tour, url=url, browser=browser, pool=pool,
+                       index=index, search=search, wait=wait)
+
+        pool = get_pool(browser) if pool is None else pool
+        return await pool.run_in_thread(cls, name, tour, url=url,
+                                        browser=browser, pool=pool, index=index,
+                                        search=search, wait=wait)
+
+    @staticmethod
+    def ready_names(name):
         # remove non-letter characters and split (first, last, etc.)
         split_names = re.sub('[^a-zA-Z]', ' ', name).split()
 
@@ -190,7 +956,8 @@ class NameCheck(LoadAndInteract):
         final_names = list(set(split_names))
         return final_names
 
-    def ready_gender(self, tour):
+    @staticmethod
+    def ready_gender(tour):
         tour = tour.upper()
         if tour == 'ATP':
             gender = 'M'
@@ -202,7 +969,54 @@ class NameCheck(LoadAndInteract):
         return gender
 
     def interact(self, driver, bide):
-        self._pr('interact')
+        self.suggestions = []
+        if self.search == 'batch':
+            suggestions = self.search_all(driver, bide)
+            if suggestions is not None:
+                self.suggestions.extend(suggestions)
+                return
+
+        self.search_each(driver, bide)
+
+    def search_all(self, driver, bide):
+        '''
+        Match every name fragment against the search bar's data source in one
+        script, mimicking the bar's case-insensitive substring filter. Returns
+        a list with a set of suggested names per fragment, or None if the data
+        source couldn't be read.
+        '''
+        # jQuery UI matches entries' labels (or the entries themselves, if
+        # they're plain strings) that contain the entered text
+        search_js = """
+            var source = null;
+            try {
+                source = $('#tags').autocomplete('option', 'source');
+            } catch (err) {}
+            if (!Array.isArray(source)) { return null; }
+
+            var labels = source.map(s => String(s.label || s.value || s));
+            var lowered = labels.map(lb => lb.toLowerCase());
+            return arguments[0].map(function(fr) {
+                var entered = fr.toLowerCase();
+                return labels.filter((lb, i) => lowered[i].includes(entered));
+            });"""
+
+        bide.until(EC.presence_of_element_located((By.ID, 'tags')),
+                   name='load')
+        with self._span('search all names', fragments=len(self.names)):
+            found = driver.execute_script(search_js, self.names)
+        if found is None:
+            return None
+
+        # keep the names from this tour, as in self.search_each()
+        return [{lb[4:] for lb in labels if lb[1] == self.gender}
+                for labels in found]
+
+    def search_each(self, driver, bide):
+        '''
+        Type each name fragment into the search bar in turn, saving the
+        suggestions that appear for it.
+        '''
         # changes value in player search box, then create and trigger a keydown
         # event to reveal autocomplete suggestions
         input_js = """
@@ -236,16 +1050,13 @@ class NameCheck(LoadAndInteract):
             }"""
 
         for nm in self.names:
-            self._pr('search name')
-            # enter the current name in the search bar
-            driver.execute_script(input_js, nm)
+            with self._span('search name', fragment=nm):
+                # enter the current name in the search bar
+                driver.execute_script(input_js, nm)
 
-            # wait for input value to change on page
-            bide.until(EC.text_to_be_present_in_element_value((By.ID, 'tags'),
-                                                              nm))
-
-            # wait for dropdown of suggestions to appear
-            bide.until(AwaitJSCondition(suggests_js, nm))
+                # wait for input value to change on page *and* the dropdown
+                # of suggestions to appear (suggests_js checks both)
+                bide.until_js(suggests_js, nm, name='search')
 
             # save set of those suggestions
             lk_matches = driver.find_elements_by_css_selector('a.ui-corner-all')
@@ -253,13 +1064,31 @@ class NameCheck(LoadAndInteract):
                           if lk.text[1] == self.gender}
             self.suggestions.append(nm_matches)
 
+    def update_index(self, index):
+        '''
+        Write the players seen in the site's suggestions and the name this
+        search resolved to back into the local player index.
+
+        Arguments
+        ---------
+
+        index : player_index.PlayerIndex, required
+            The index to update.
+        '''
+        for nm in set().union(*self.suggestions):
+            index.add(self.gender, nm)
+
+        # (validate_name() already ensured there's exactly one shared name)
+        resolved, = ft.reduce(set.intersection, self.suggestions)
+        index.record_query(self.names, self.gender, resolved)
+        index.save()
+
     def validate_name(self):
         '''
         Find the name that appears in every set in `self.suggestions` after
         webpage interaction is complete. Throws an error if there's no match
         or more than one.
         '''
-        self._pr('validate_name')
         # gather suggestion(s) that matched each name
         name_set = ft.reduce(set.intersection, self.suggestions)
 
@@ -286,6 +1115,121 @@ class NameCheck(LoadAndInteract):
                 'Otherwise, be more specific if possible, providing '
                 'full first *and* last names.')
 
+def resolve_names(names, tour, url=HOME_URL, browser='chromium', pool=None,
+                  index=None, wait=None, flight=None):
+    '''
+    Run NameCheck() on several names at once. Returns a dict that maps each
+    name to its NameCheck().name_str.
+
+    Names that only differ in case, punctuation, or word order are looked up
+    once. The rest are checked concurrently, each with a browser borrowed
+    from `pool` (so up to `pool.size` searches run at a time; names the local
+    index can answer don't need one). If any names can't be resolved, raises
+    the error for the first of them in `names`.
+
+    Arguments
+    ---------
+
+    names : list of str, required
+        The players' names, in any format NameCheck() accepts.
+
+    tour : str, required
+        The players' tour. Should be 'WTA' if they're female or 'ATP' if
+        they're male.
+
+    url, browser, pool, index, wait : optional
+        As in NameCheck().
+
+    flight : SingleFlight, None, or False, optional
+        Coalesces lookups of the same name that other threads start while
+        one is in flight. If None, uses the shared SingleFlight from
+        get_flight(); if False, doesn't coalesce. [default: None]
+    '''
+    pool = get_pool(browser) if pool is None else pool
+    flight = get_flight() if flight is None else flight
+
+    # group names by the set of fragments that will be searched
+    keys = {nm: tuple(sorted({fr.lower() for fr in
+                              re.sub('[^a-zA-Z]', ' ', nm).split()}))
+            for nm in names}
+    unique = {}
+    for nm, key in keys.items():
+        unique.setdefault(key, nm)
+
+    name_check = ft.partial(NameCheck, tour=tour, url=url, browser=browser,
+                            pool=pool, index=index, wait=wait)
+
+    def check(nm, key):
+        with get_tracer().span('resolve name', player=nm):
+            if not flight:
+                return name_check(nm).name_str
+            return flight.run(f"name|{url}|{tour.upper()}|{','.join(key)}",
+                              lambda: name_check(nm).name_str)
+
+    with get_tracer().span('resolve_names', names=len(unique), tour=tour):
+        if len(unique) <= 1:
+            # no need for extra threads
+            results = {key: check(nm, key) for key, nm in unique.items()}
+        else:
+            with cf.ThreadPoolExecutor(min(pool.size,
+                                           len(unique))) as executor:
+                # (each search runs in a copy of this context so its timings
+                # nest under this call's)
+                futures = {key: executor.submit(
+                               contextvars.copy_context().run, check, nm, key)
+                           for key, nm in unique.items()}
+                # (the first failure in input order is raised once all finish)
+                results = {key: fut.result() for key, fut in futures.items()}
+
+    return {nm: results[key] for nm, key in keys.items()}
+
+class PlayerList(LoadAndInteract):
+    '''
+    Retrieves every label (e.g., '(M) Roger Federer') that the player search
+    bar on Tennis Abstract's homepage can suggest by reading the bar's
+    autocomplete data source directly. The result, saved in the `labels`
+    attribute, is used to fill a local PlayerIndex in refresh_index().
+
+    Arguments
+    ---------
+
+    url : str, optional
+        The URL of the site's homepage.
+        [default: 'http://www.tennisabstract.com/']
+
+    browser : str, optional
+        The browser that selenium will drive headlessly to the relevant URL.
+        For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
+
+    pool : DriverPool or None, optional
+        The pool from which to borrow a WebDriver instance. If None, uses the
+        shared pool for `browser`. [default: None]
+
+    wait : WaitPolicy or None, optional
+        How to wait for the search bar to load. If None, uses a WaitPolicy()
+        with its default settings. [default: None]
+    '''
+    def __init__(self, url=HOME_URL, browser='chromium', pool=None,
+                 wait=None):
+        self.labels = []
+        super().__init__(url, browser, pool=pool, wait=wait)
+
+    def interact(self, driver, bide):
+        # the search bar is a jQuery UI autocomplete whose source is an array
+        source_js = """
+            var source = $('#tags').autocomplete('option', 'source');
+            return Array.isArray(source) ? source : null;"""
+
+        bide.until(EC.presence_of_element_located((By.ID, 'tags')),
+                   name='load')
+        labels = driver.execute_script(source_js)
+
+        if not labels:
+            raise ValueError("Couldn't read the search bar's list of players. "
+                             "The site's homepage may have changed.")
+
+        self.labels = labels
+
 class QueryData(LoadAndInteract):
     '''
     Performs the actual connection-based query work for DownloadStats() by
@@ -312,20 +1256,109 @@ class QueryData(LoadAndInteract):
         The browser that selenium will drive headlessly to the relevant URL.
         For now, choose between 'chromium' and 'firefox'. [default: 'chromium']
 
-    load_images : boolean, optional [DEPRECATED?]
-        When False, prevents images on the target webpage from loading, which
-        *should* decrease wait times. I hope to test whether this is the case.
-        [default: False]
+    pool : DriverPool or None, optional
+        The pool from which to borrow a WebDriver instance. If None, uses the
+        shared pool for `browser`. (Pass `get_pool(browser, lean=True)` to
+        skip loading images and other resources the page doesn't need.)
+        [default: None]
+
+    wait : WaitPolicy or None, optional
+        How to wait for the table and each of its views. If None, uses a
+        WaitPolicy() with its default settings. [default: None]
+
+    extract : str, optional
+        How to retrieve the tables. 'html' saves each view's markup after
+        clicking through the page from Python. 'json' runs one script in the
+        page that clicks through every view itself and returns each table's
+        cell text as a dict with 'header', 'rows', and 'note' (whether the
+        table holds a message instead of matches) keys, which is much less
+        to send back and doesn't need to be parsed as HTML. Either kind of
+        `html_tables` works with DownloadStats.merge_and_edit_tables().
+        [default: 'html']
     '''
-    # should max_wait (seconds) be an argument?
-    def __init__(self, url, tour, browser='chromium'):#load_images=False):
+    # clicks through the views with arguments[0] (a list of [selector, kind,
+    # expected] toggles), then returns every view's table and the title
+    EXTRACT_JS = """
+        var done = arguments[arguments.length - 1];
+        var toggles = arguments[0];
+        var waitMs = arguments[1];
+
+        // mimic the text cleanup and colspan expansion of pandas.read_html
+        function clean(text) {
+            return text.trim().replace(/[\\r\\n]+|\\s{2,}/g, ' ');
+        }
+        function readTable() {
+            var table = document.getElementById('matches');
+            if (!table) { return null; }
+
+            var header = [], rows = [];
+            Array.from(table.rows).forEach(function(tr, i) {
+                var cells = [];
+                Array.from(tr.cells).forEach(function(td) {
+                    var text = clean(td.textContent);
+                    for (var j = 0; j < (td.colSpan || 1); j++) {
+                        cells.push(text);
+                    }
+                });
+                var isHeader = (tr.parentNode.tagName === 'THEAD'
+                                || Array.from(tr.cells).every(
+                                       td => td.tagName === 'TH'));
+                if (i === 0 && isHeader) { header = cells; }
+                else { rows.push(cells); }
+            });
+            return {header: header, rows: rows,
+                    note: !!table.querySelector('p')};
+        }
+        function switched(selector, kind, expected) {
+            if (kind === 'text') {
+                var elem = document.querySelector(selector);
+                return !!elem && elem.textContent.includes(expected);
+            }
+            var elem = document.querySelector(selector + expected);
+            return !elem || elem.offsetParent === null;
+        }
+
+        var views = [readTable()];
+        var i = 0;
+        function next() {
+            if (i === toggles.length) {
+                var label = document.getElementById('tablelabel');
+                done({views: views, title: label ? label.innerText : ''});
+                return;
+            }
+            var [selector, kind, expected] = toggles[i++];
+            var span = document.querySelector(selector);
+            if (!span) { done({missing: selector}); return; }
+            span.click();
+
+            var start = Date.now();
+            (function check() {
+                if (switched(selector, kind, expected)) {
+                    views.push(readTable());
+                    next();
+                } else if (Date.now() - start > waitMs) {
+                    done({timeout: selector});
+                } else {
+                    setTimeout(check, 10);
+                }
+            })();
+        }
+        next();"""
+
+    def __init__(self, url, tour, browser='chromium', pool=None, wait=None,
+                 extract='html'):
+        if extract not in {'html', 'json'}:
+            raise ValueError('invalid extract. choose "html" or "json".')
+
         self.tour = self.ready_tour(tour)
+        self.extract = extract
+        self.wait = WaitPolicy() if wait is None else wait
 
         self.html_tables = []
         self.title = None
 
         # load URL
-        super().__init__(url, browser)#, load_images)
+        super().__init__(url, browser, pool=pool, wait=self.wait)
 
     def ready_tour(self, tour):
         tour = tour.upper()
@@ -337,19 +1370,30 @@ class QueryData(LoadAndInteract):
     def interact(self, driver, bide):
         # fetch original stats table on page, toggle its stats by simulating
         # clicks on one or more pseudo-links, then save the new table(s)
-        self._pr('interact')
+        self.html_tables = []
+
+        # conditions checked in the page whenever it changes
+        has_text_js = """
+            var elem = document.querySelector(arguments[0]);
+            return !!elem && elem.textContent.includes(arguments[1]);"""
+        hidden_js = """
+            var elem = document.querySelector(arguments[0]);
+            return !elem || elem.offsetParent === null;"""
 
         # reverse loss scores in table; wait for change to reflect
-        self._pr('reverse losses')
         rev_elem = 'span.revscore.likelink'
-        bide.until(EC.element_to_be_clickable((By.CSS_SELECTOR, rev_elem)))
-        driver.find_element_by_css_selector(rev_elem).click()
-        bide.until(EC.text_to_be_present_in_element((By.CSS_SELECTOR, rev_elem),
-                                                    'Standard Scores'))
+        bide.until(EC.element_to_be_clickable((By.CSS_SELECTOR, rev_elem)),
+                   'The reverse scores link never became clickable.',
+                   name='load')
+        with self._span('reverse losses'):
+            driver.find_element_by_css_selector(rev_elem).click()
+            bide.until_js(has_text_js, rev_elem, 'Standard Scores',
+                          message='Loss scores were never reversed.',
+                          name='toggle')
 
         # find and save the initial table visible on the page
-        bide.until(EC.visibility_of_element_located((By.ID, 'matches')))
-        self.html_tables.append(self.search_table(driver))
+        bide.until(EC.visibility_of_element_located((By.ID, 'matches')),
+                   'The match data table never appeared.', name='load')
 
         # get id(s) of <span>(s) on which to simulate clicks and
         # their expected text content after the click takes place
@@ -361,6 +1405,12 @@ class QueryData(LoadAndInteract):
             classes = ['statsr', 'statsw'] # 'statso' selected by default
             expected = '.likelink'
 
+        if self.extract == 'json':
+            self.extract_views(driver, classes, expected)
+            return
+
+        self.html_tables.append(self.search_table(driver))
+
         # save table title, if it exists
         title = driver.find_element_by_id('tablelabel').text
         if title:
@@ -369,32 +1419,55 @@ class QueryData(LoadAndInteract):
             # if not, wait until after page interaction to deal with it
             self.title = ''
 
-        # GIVE EC METHODS AN ERROR MESSAGE FOR WHEN CONDITION IS NOT MET ON TIME
-        # ...
         for cl in classes:
-            self._pr('click span')
-            # simulate a click on the current element
-            curr_elem = 'span.' + cl# + '.likelink'
-            driver.find_element_by_css_selector(curr_elem).click()
-
-            # wait for clicked span to lose its 'likelink' class
-            # (will also pass if the span just doesn't exist)
-            if self.tour == 'WTA':
-                # until rev_elem's text changes
-                bide.until(EC.text_to_be_present_in_element(( By.CSS_SELECTOR,
-                                                              curr_elem ),
-                                                            expected))
-            else:
-                # until clicked span loses its 'likelink' class
-                bide.until(EC.invisibility_of_element_located((By.CSS_SELECTOR,
-                                                               curr_elem
-                                                               + expected)))
-
-            # save the current version of the data table (always has same id)
-            self.html_tables.append(self.search_table(driver))
+            with self._span('click span', view=cl):
+                # simulate a click on the current element
+                curr_elem = 'span.' + cl# + '.likelink'
+                driver.find_element_by_css_selector(curr_elem).click()
+
+                # wait for clicked span to lose its 'likelink' class
+                # (will also pass if the span just doesn't exist)
+                if self.tour == 'WTA':
+                    # until rev_elem's text changes
+                    bide.until_js(has_text_js, curr_elem, expected,
+                                  message=f"The '{cl}' view never loaded.",
+                                  name='toggle')
+                else:
+                    # until clicked span loses its 'likelink' class
+                    bide.until_js(hidden_js, curr_elem + expected,
+                                  message=f"The '{cl}' view never loaded.",
+                                  name='toggle')
+
+                # save the current version of the data table (same id always)
+                self.html_tables.append(self.search_table(driver))
+
+    def extract_views(self, driver, classes, expected):
+        '''
+        Click through every view of the table and read them all (plus the
+        table title) with a single in-page script, saving each view's cells
+        in self.html_tables as a dict (see the `extract` argument).
+        '''
+        kind = 'text' if self.tour == 'WTA' else 'hidden'
+        toggles = [['span.' + cl, kind, expected] for cl in classes]
+
+        timeout = self.wait.timeout_for('toggle')
+        driver.set_script_timeout(timeout * len(toggles) + 1)
+        with self._span('extract views', views=len(toggles) + 1):
+            found = driver.execute_async_script(self.EXTRACT_JS, toggles,
+                                                int(timeout * 1000))
+
+        if 'missing' in found:
+            raise selexcept.NoSuchElementException(
+                f"Couldn't find the '{found['missing']}' view toggle.")
+        elif 'timeout' in found:
+            raise selexcept.TimeoutException(
+                f"The '{found['timeout']}' view never loaded.")
+
+        self.html_tables = [tab if tab is not None else ''
+                            for tab in found['views']]
+        self.title = unicodedata.normalize('NFKD', found['title'] or '')
 
     def search_table(self, driver):
-        #self._pr('search_table')
         try:
             table = driver.find_element_by_id('matches')
             return table.get_attribute('outerHTML')
@@ -409,3 +1482,480 @@ class QueryData(LoadAndInteract):
         # if soup.find('p'), error #2
         # if not soup.find('table'), error #3
         # then, work with NON-soup content for rest of method
+
+def _decode_body(headers, body):
+    # undo any compression and decode the page with its declared charset
+    if headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    charset = headers.get_content_charset() or 'utf-8'
+    return body.decode(charset, errors='replace')
+
+class HTTPPool:
+    '''
+    Fetches pages over plain HTTP(S) while keeping connections to each host
+    open between requests, so consecutive queries to Tennis Abstract skip the
+    TCP (and TLS) handshake. Used by HTTPQueryData in place of a browser.
+
+    Arguments
+    ---------
+
+    size : int, optional
+        The maximum number of idle connections kept open per host. [default: 4]
+
+    timeout : float, optional
+        How long (in seconds) to wait on a connection before giving up.
+        [default: 10]
+    '''
+    HEADERS = {'User-Agent': 'Mozilla/5.0 (ipa-sba-sinnet)',
+               'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+
+    def __init__(self, size=4, timeout=10):
+        self.size = size
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, max_redirects=5):
+        '''
+        Return the decoded body of the page at `url`, following redirects.
+
+        Arguments
+        ---------
+
+        url : str, required
+            The URL of the target webpage.
+
+        max_redirects : int, optional
+            How many redirects to follow before giving up. [default: 5]
+        '''
+        for _ in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path or '/'
+            path += '?' + parts.query if parts.query else ''
+
+            status, headers, body = self._request(parts.scheme, parts.netloc,
+                                                  path)
+            if status in {301, 302, 303, 307, 308}:
+                url = urllib.parse.urljoin(url, headers.get('Location', ''))
+                continue
+            elif status >= 400:
+                raise ConnectionError(f"{url} returned HTTP status {status}.")
+
+            return _decode_body(headers, body)
+
+        raise ConnectionError(f"Too many redirects while fetching {url}.")
+
+    def _request(self, scheme, host, path):
+        # a reused connection may have been closed by the server in the
+        # meantime, so retry once on a fresh one if the first attempt fails
+        for attempt in range(2):
+            conn = self._checkout(scheme, host, fresh=attempt > 0)
+            try:
+                conn.request('GET', path, headers=self.HEADERS)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(scheme, host, conn)
+            return resp.status, resp.headers, body
+
+    def _checkout(self, scheme, host, fresh=False):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if idle and not fresh:
+                return idle.pop()
+
+        Connection = (http.client.HTTPSConnection if scheme == 'https'
+                      else http.client.HTTPConnection)
+        return Connection(host, timeout=self.timeout)
+
+    def _checkin(self, scheme, host, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        '''
+        Close every idle connection.
+        '''
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+_HTTP_POOL = HTTPPool()
+
+def get_http_pool():
+    '''
+    Return the HTTPPool shared by every HTTPQueryData instance.
+    '''
+    return _HTTP_POOL
+
+class AsyncHTTPPool:
+    '''
+    The asyncio counterpart of HTTPPool, used by HTTPQueryData.fetch(). Pages
+    are downloaded on the event loop with asyncio streams, so any number of
+    queries can wait on the network without occupying a thread. Connections
+    are kept open between requests to the same host.
+
+    A pool's connections belong to the event loop that opened them; if the
+    pool is used from a new loop (e.g., in a later asyncio.run() call), it
+    starts over with fresh connections.
+
+    Arguments
+    ---------
+
+    size : int, optional
+        The maximum number of idle connections kept open per host. [default: 4]
+
+    limit : int, optional
+        The maximum number of requests in flight at once, so a burst of
+        queries doesn't flood the site. [default: 16]
+
+    timeout : float, optional
+        How long (in seconds) to wait on a connection before giving up.
+        [default: 10]
+    '''
+    HEADERS = HTTPPool.HEADERS
+
+    def __init__(self, size=4, limit=16, timeout=10):
+        self.size = size
+        self.limit = limit
+        self.timeout = timeout
+        self._idle = {}
+        self._slots = None
+        self._loop = None
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # (the old loop's connections can't be used or closed from here)
+            self._loop = loop
+            self._idle = {}
+            self._slots = asyncio.Semaphore(self.limit)
+
+    async def get(self, url, max_redirects=5):
+        '''
+        Return the decoded body of the page at `url`, following redirects.
+
+        Arguments
+        ---------
+
+        url : str, required
+            The URL of the target webpage.
+
+        max_redirects : int, optional
+            How many redirects to follow before giving up. [default: 5]
+        '''
+        self._bind()
+        async with self._slots:
+            for _ in range(max_redirects + 1):
+                parts = urllib.parse.urlsplit(url)
+                path = parts.path or '/'
+                path += '?' + parts.query if parts.query else ''
+
+                status, headers, body = await self._request(parts.scheme,
+                                                            parts.netloc, path)
+                if status in {301, 302, 303, 307, 308}:
+                    url = urllib.parse.urljoin(url,
+                                               headers.get('Location', ''))
+                    continue
+                elif status >= 400:
+                    raise ConnectionError(
+                        f"{url} returned HTTP status {status}.")
+
+                return _decode_body(headers, body)
+
+        raise ConnectionError(f"Too many redirects while fetching {url}.")
+
+    async def _request(self, scheme, host, path):
+        request = ''.join([f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"]
+                          + [f"{key}: {val}\r\n"
+                             for key, val in self.HEADERS.items()]
+                          + ['\r\n']).encode('latin-1')
+
+        # as in HTTPPool, retry once on a fresh connection in case a reused
+        # one was closed by the server in the meantime
+        for attempt in range(2):
+            reader, writer = await self._checkout(scheme, host,
+                                                  fresh=attempt > 0)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, will_close = await asyncio.wait_for(
+                    self._read_response(reader), self.timeout)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                    ConnectionError, OSError, ValueError):
+                writer.close()
+                if attempt:
+                    raise
+                continue
+
+            if will_close:
+                writer.close()
+            else:
+                self._checkin(scheme, host, (reader, writer))
+            return status, headers, body
+
+    @staticmethod
+    async def _read_response(reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, _, header_lines = head.partition(b'\r\n')
+        version, status = status_line.split()[:2]
+        headers = http.client.parse_headers(io.BytesIO(header_lines))
+        will_close = (version == b'HTTP/1.0'
+                      or headers.get('Connection', '').lower() == 'close')
+
+        if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # skip any trailers up to the final blank line
+                    while (await reader.readline()) not in {b'\r\n', b''}:
+                        pass
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+            body = bytes(body)
+        elif 'Content-Length' in headers:
+            body = await reader.readexactly(int(headers['Content-Length']))
+        else:
+            # the body runs until the server closes the connection
+            body = await reader.read()
+            will_close = True
+
+        return int(status), headers, body, will_close
+
+    async def _checkout(self, scheme, host, fresh=False):
+        idle = self._idle.setdefault((scheme, host), [])
+        while idle and not fresh:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                return reader, writer
+            writer.close()
+
+        hostname, _, port = host.rpartition(':')
+        if not port.isdigit():
+            hostname, port = host, (443 if scheme == 'https' else 80)
+
+        return await asyncio.wait_for(
+            asyncio.open_connection(hostname, int(port),
+                                    ssl=True if scheme == 'https' else None),
+            self.timeout)
+
+    def _checkin(self, scheme, host, conn):
+        idle = self._idle.setdefault((scheme, host), [])
+        if len(idle) < self.size:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def close(self):
+        '''
+        Close every idle connection. Must be awaited from the event loop that
+        opened them.
+        '''
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+_ASYNC_HTTP_POOL = AsyncHTTPPool()
+
+def get_async_http_pool():
+    '''
+    Return the AsyncHTTPPool shared by every HTTPQueryData.fetch() call.
+    '''
+    return _ASYNC_HTTP_POOL
+
+# one set's games, as in '7-6' of '7-6(4)'
+_SET_SCORE = re.compile(r'(\d+)-(\d+)')
+
+class HTTPQueryData:
+    '''
+    An experimental, browser-free alternative to QueryData() that downloads
+    a player data page over plain HTTP and reads its match data tables and
+    table title from the page source, leaving the same `html_tables` and
+    `title` attributes for DownloadStats() to use.
+
+    Since no JavaScript runs, nothing gets clicked. Instead, every stat view
+    is read from markup the page embeds for its scripts as a `views` array,
+    and loss scores are reversed the way the 'Reverse Loss Scores' link does
+    it. Each entry of `html_tables` is a dict of cells, as from
+    QueryData(extract='json').
+
+    That `views` array is the format served by the local stand-in site in
+    benchmarks/standin_server.py. Tennis Abstract's own pages build their
+    tables in other ways that this class doesn't read yet, so for them it
+    raises a ValueError whenever matches are found (rather than return a
+    result that's missing columns). Use QueryData() for the live site.
+
+    Arguments
+    ---------
+
+    url : str, required
+        The URL of the target webpage.
+
+    tour : str, required
+        The chosen player's tour. Should be 'WTA' if the player is female or
+        'ATP' if the player is male.
+
+    http_pool : HTTPPool or None, optional
+        The pool of connections used to download the page. If None, uses the
+        shared pool from get_http_pool(). [default: None]
+    '''
+    # the number of stat views on each tour's pages (as in QueryData())
+    N_VIEWS = {'ATP': 3, 'WTA': 2}
+
+    def __init__(self, url, tour, http_pool=None):
+        self.tour = self.ready_tour(tour)
+
+        http_pool = get_http_pool() if http_pool is None else http_pool
+        with get_tracer().span('HTTPQueryData', url=url) as self.timings:
+            with get_tracer().span('http get'):
+                page = http_pool.get(url)
+            self.read_page(page)
+
+    @classmethod
+    async def fetch(cls, url, tour, http_pool=None):
+        '''
+        The asyncio counterpart of HTTPQueryData(). Takes the same arguments
+        (except that `http_pool` should be an AsyncHTTPPool, or None for the
+        shared one from get_async_http_pool()) and returns the finished
+        instance.
+        '''
+        query = cls.__new__(cls)
+        query.tour = query.ready_tour(tour)
+
+        http_pool = get_async_http_pool() if http_pool is None else http_pool
+        with get_tracer().span('HTTPQueryData', url=url) as query.timings:
+            with get_tracer().span('http get'):
+                page = await http_pool.get(url)
+            query.read_page(page)
+        return query
+
+    def read_page(self, page):
+        '''
+        Save the match data tables and table title from the page source.
+        '''
+        self.html_tables = self.search_tables(page)
+        self.title = self.search_title(page)
+
+    def ready_tour(self, tour):
+        tour = tour.upper()
+        if tour not in {'ATP', 'WTA'}:
+            raise ValueError('Ineligible tour. Should be ATP or WTA.')
+
+        return tour
+
+    @staticmethod
+    def _find_element(page, tag, elem_id):
+        '''
+        Return the full markup of the first `tag` element in `page` whose id is
+        `elem_id`, accounting for nested elements of the same tag, or '' if
+        there's no such element.
+        '''
+        opener = re.search(rf"<{tag}\b[^>]*\bid=[\"']?{elem_id}\b[^>]*>",
+                           page, flags=re.I)
+        if opener is None:
+            return ''
+
+        # walk through the tags that follow, closing once depth returns to 0
+        depth = 1
+        for tg in re.finditer(rf"<(/?){tag}\b[^>]*>", page[opener.end():],
+                              flags=re.I):
+            depth += -1 if tg.group(1) else 1
+            if depth == 0:
+                return page[opener.start() : opener.end() + tg.end()]
+
+        return ''
+
+    def search_tables(self, page):
+        '''
+        Return a list with the cells of every stat view in the page source,
+        with loss scores reversed. If the page doesn't embed its views,
+        returns a list holding its `#matches` table instead (or '' if that's
+        missing, too) as long as the table holds no matches, so that
+        DownloadStats() can report what happened.
+        '''
+        views = self._embedded_views(page)
+        if views is None:
+            table = self._find_element(page, 'table', 'matches')
+            found = parse_table(table)
+            if found is not None and found['rows'] and not found['note']:
+                raise ValueError(
+                    "The page doesn't embed its stat views in a format the "
+                    "experimental 'http' backend can read. Use "
+                    "backend='browser' instead.")
+            return [table]
+
+        if len(views) != self.N_VIEWS[self.tour]:
+            raise ValueError(
+                f"Expected {self.N_VIEWS[self.tour]} stat views on the page "
+                f"but found {len(views)}. Try backend='browser' instead.")
+
+        tables = [parse_table(vw) for vw in views]
+        for tab in tables:
+            if tab is not None:
+                self.reverse_losses(tab)
+
+        return [tab if tab is not None else '' for tab in tables]
+
+    @staticmethod
+    def _embedded_views(page):
+        '''
+        Return the list of view markup that the page embeds for its scripts
+        as `var views = [...]`, or None if there isn't one.
+        '''
+        start = re.search(r'\bvar\s+views\s*=\s*', page)
+        if start is None:
+            return None
+
+        try:
+            views, _ = json.JSONDecoder().raw_decode(page, start.end())
+        except ValueError:
+            return None
+
+        return views if type(views) == list else None
+
+    @staticmethod
+    def reverse_losses(table):
+        '''
+        Flip each set score of the losses in a table's cells (as from
+        parse_table()) in place, so they're written from the player's side.
+        Losses are the rows whose result cell ends with 'd.'.
+        '''
+        header = table['header']
+        if '' not in header or 'Score' not in header:
+            return
+
+        result, score = header.index(''), header.index('Score')
+        for row in table['rows']:
+            if len(row) > max(result, score) and row[result].endswith('d.'):
+                row[score] = _SET_SCORE.sub(r'\2-\1', row[score])
+
+    def search_title(self, page):
+        '''
+        Return the text of the table title (`#tablelabel`) from the page
+        source, or '' if it's missing.
+        '''
+        label = re.search(r"<(\w+)\b[^>]*\bid=[\"']?tablelabel\b", page,
+                          flags=re.I)
+        if label is None:
+            return ''
+
+        markup = self._find_element(page, label.group(1), 'tablelabel')
+        text = html.unescape(re.sub(r'<[^>]+>', '', markup))
+        return unicodedata.normalize('NFKD', ' '.join(text.split()))
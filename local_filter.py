@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+import re
+
+from execute_query import HOME_URL, resolve_names
+from validate_attrs import ValidateURLAttrs
+
+class LocalFilter(ValidateURLAttrs):
+    '''
+    Answers `attrs` queries from a player's unfiltered career match data (as
+    in DownloadStats().match_data for a query without `attrs`) instead of the
+    site, by turning each filter into a boolean mask over the frame's columns.
+    One career download can then serve many filtered queries in memory.
+
+    Values are validated the same way as in ConstructURL(). Filters on
+    different keys are combined with AND; a list of values for one key is
+    combined with OR, as on the site.
+
+    Only filters that the match data's columns fully determine are
+    reproduced: 'start date'/'end date', 'surface', 'event', 'round' (except
+    the ATP-only 'First Round'/'First Match'-style options), 'score' (except
+    deciding set tiebreaks), 'vs rank', 'vs entry', 'head-to-head', and
+    'exclude opp'. The rest ('level', 'sets', 'as rank', 'vs current rank',
+    'as entry', 'vs hand', and 'vs height') depend on information the tables
+    don't hold, so filter() returns None for queries that use them and they
+    must be sent to the site.
+
+    Arguments
+    ---------
+
+    data : pandas.DataFrame, required
+        A player's unfiltered career match data.
+
+    tour : str, required
+        The player's tour. Should be 'WTA' if the player is female or 'ATP' if
+        the player is male.
+    '''
+    SITE_ONLY_KEYS = {'level', 'sets', 'as rank', 'vs current rank',
+                      'as entry', 'vs hand', 'vs height'}
+
+    # the site's codes for each key, in order
+    SURFACES = ['Hard', 'Clay', 'Grass', 'Carpet']
+    ROUNDS = ['F', 'SF', 'QF', 'R16', 'R32', 'R64', 'R128']
+    ENTRIES = [r'\d+', None, 'Q', 'WC'] # seeded, unseeded, qualifier, wc
+
+    # 'score' codes -> (set scores, whose sets: 'all', 'won', or 'lost')
+    SCORES = {'0': ({(7, 6)}, 'all'), '1': ({(7, 6)}, 'won'),
+              '2': ({(7, 6)}, 'lost'),
+              '4': ({(7, 5)}, 'all'), '5': ({(7, 5)}, 'won'),
+              '6': ({(7, 5)}, 'lost'),
+              '7': ({(6, 0)}, 'all'), '8': ({(6, 0)}, 'won'),
+              '9': ({(6, 0)}, 'lost'),
+              '10': ({(6, 1)}, 'all'), '11': ({(6, 1)}, 'won'),
+              '12': ({(6, 1)}, 'lost')}
+
+    def __init__(self, data, tour):
+        self.data = data
+        self.tour = tour.upper()
+        self._opponents = None
+        self._sets = None
+
+    @property
+    def opponents(self):
+        '''
+        A DataFrame with each match's opponent's entry status ('entry', e.g.,
+        '3' or 'WC') and name without spaces or punctuation ('name').
+        '''
+        if self._opponents is None:
+            # e.g., 'd. (WC)Andy Murray [GBR]' or 'Andy Murray [GBR] d.'
+            opp = (self.data['Result'].astype(str)
+                   .str.replace('d.', '', regex=False)
+                   .str.extract(r'^\s*(?:\((\w+)\))?([^\[]*)'))
+            opp.columns = ['entry', 'name']
+            opp['name'] = self._squash(opp['name'])
+            self._opponents = opp
+
+        return self._opponents
+
+    @property
+    def sets(self):
+        '''
+        A DataFrame with a row for each set of each match, holding the set's
+        winning and losing game counts and whether the player won it.
+        '''
+        if self._sets is None:
+            # both backends reverse the scores of losses, so every score is
+            # written from the player's side: a set is theirs if its first
+            # number is higher
+            # (index by position, so the match data's index doesn't matter)
+            games = (self.data['Score'].astype(str).reset_index(drop=True)
+                     .str.extractall(r'(\d+)-(\d+)').astype(int))
+            games.columns = ['first', 'second']
+
+            sets = pd.DataFrame({
+                'high': games.max(axis=1), 'low': games.min(axis=1),
+                'won': games['first'] > games['second']}, index=games.index)
+            self._sets = sets
+
+        return self._sets
+
+    @staticmethod
+    def _squash(names):
+        return names.str.replace('[^a-zA-Z]', '', regex=True).str.lower()
+
+    @classmethod
+    def site_only(cls, attrs):
+        '''
+        Return the keys in `attrs` whose filters can't be reproduced locally.
+        (Some values of 'round' and 'score' can't either; filter() catches
+        those.)
+
+        Arguments
+        ---------
+
+        attrs : dict, required
+            The query's attributes, as in ConstructURL().
+        '''
+        return [key for key in attrs if key in cls.SITE_ONLY_KEYS]
+
+    def filter(self, attrs, resolved=None, url=HOME_URL, browser='chromium',
+               pool=None, index=None, wait=None):
+        '''
+        Return the rows of the match data that the site would return for
+        `attrs`, or None if any of its filters can't be reproduced locally.
+
+        Arguments
+        ---------
+
+        attrs : dict, required
+            The query's attributes, as in ConstructURL().
+
+        resolved : dict or None, optional
+            Opponents' names that were already resolved, mapped to their name
+            strings. Other 'head-to-head' and 'exclude opp' names are looked
+            up with execute_query.resolve_names(). [default: None]
+
+        url, browser, pool, index, wait : optional
+            As in execute_query.resolve_names().
+        '''
+        if self.site_only(attrs):
+            return None
+
+        self._check_dates(attrs)
+
+        masks = []
+        for key, val in attrs.items():
+            if key in {self.TIME1_KEY, self.TIME2_KEY,
+                       self.H2H_KEY, self.EXCLUDE_KEY}:
+                continue # handled below
+
+            values = val if type(val) == list else [val]
+            key_masks = [self._mask(key, vl) for vl in values]
+            if any(mk is None for mk in key_masks):
+                return None
+            masks.append(np.logical_or.reduce(key_masks))
+
+        if self.TIME1_KEY in attrs:
+            start, end = sorted([attrs[self.TIME1_KEY], attrs[self.TIME2_KEY]])
+            masks.append(self.data['Date'].between(start, end).to_numpy())
+
+        # look up all opponents' names at once
+        names = self._opponent_names(attrs)
+        resolved = {} if resolved is None else resolved
+        unresolved = [nm for nm in names if nm not in resolved]
+        if unresolved:
+            resolved = {**resolved,
+                        **resolve_names(unresolved, self.tour, url=url,
+                                        browser=browser, pool=pool,
+                                        index=index, wait=wait)}
+
+        for key in [self.H2H_KEY, self.EXCLUDE_KEY]:
+            if key not in attrs:
+                continue
+
+            val = attrs[key]
+            if type(val) not in {str, list}:
+                raise ValueError(
+                    f"Invalid value type for key '{key}'. Try a string "
+                    "name or a list of string names.")
+
+            wanted = set(self._squash(pd.Series(
+                [resolved[nm] for nm in (val if type(val) == list else [val])],
+                dtype=object)))
+            played = self.opponents['name'].isin(wanted).to_numpy()
+            masks.append(played if key == self.H2H_KEY else ~played)
+
+        if not masks:
+            return self.data
+
+        return self.data[np.logical_and.reduce(masks)]
+
+    def _mask(self, key, value):
+        '''
+        Return a boolean array that marks the matches with `value` for the
+        filter under `key`, or None if it can't be reproduced locally.
+        '''
+        data = self.data
+
+        if key == 'surface':
+            surface = self.SURFACES[int(self._code(key, value, self.tour))]
+            return (data['Surface'].astype(str).str.lower()
+                    == surface.lower()).to_numpy()
+
+        elif key == 'event':
+            # the event's labels on the site (e.g., 'Rome_Masters' for ATP)
+            code = self._code(key, value, self.tour)
+            labels = {lb.replace('_', ' ').strip().lower()
+                      for lb in re.split('qq,?', code) if lb}
+            return (data['Tournament'].astype(str).str.strip().str.lower()
+                    .isin(labels).to_numpy())
+
+        elif key == 'round':
+            code = int(self._code(key, value, self.tour))
+            if code >= len(self.ROUNDS):
+                return None # depends on the draw, not just the round's name
+            return (data['Rd'].astype(str) == self.ROUNDS[code]).to_numpy()
+
+        elif key == 'score':
+            code = self._code(key, value, self.tour)
+            if code not in self.SCORES:
+                return None # e.g., deciding set tiebreaks
+            scores, whose = self.SCORES[code]
+
+            sets = self.sets
+            hit = pd.Series(
+                [(hi, lo) in scores for hi, lo in zip(sets['high'],
+                                                       sets['low'])],
+                index=sets.index)
+            if whose != 'all':
+                hit &= sets['won'] if whose == 'won' else ~sets['won']
+
+            matched = hit.groupby(level=0).any()
+            return (matched.reindex(range(len(data)), fill_value=False)
+                    .to_numpy(dtype=bool))
+
+        elif key == 'vs rank':
+            self._code(key, value, self.tour)
+            low, high = ((1, int(value.split()[-1])) if type(value) == str
+                         else sorted(value))
+            ranks = pd.to_numeric(data['vRk'], errors='coerce')
+            return ranks.between(low, high).to_numpy()
+
+        elif key == 'vs entry':
+            pattern = self.ENTRIES[int(self._code(key, value, self.tour))]
+            entry = self.opponents['entry'].fillna('')
+            if pattern is None: # unseeded
+                return ~entry.str.fullmatch(self.ENTRIES[0]).to_numpy()
+            return entry.str.fullmatch(pattern).to_numpy()
+
+        raise KeyError(f"'{key}' is an invalid attribute.")
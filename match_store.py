@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+from construct_query import ConstructURL, DownloadStats, NoMatchesError
+from datetime import datetime
+from execute_query import CACHE_DIR, HOME_URL, resolve_names
+from local_filter import LocalFilter
+
+class MatchStore:
+    '''
+    A local, columnar store of players' career match data. Each player's
+    formatted `match_data` (as from DownloadStats()) is saved as Parquet in a
+    `tour=<tour>/player=<name_str>` partition under `root`, and a manifest
+    (`_manifest.json`, which Parquet readers skip) records the date of the
+    latest match saved for each one.
+
+    Once a player is stored, update() only asks the site for matches from
+    that date forward (with a 'start date'/'end date' query) and swaps them
+    in for the stored rows from the same dates, so keeping a career current
+    costs one small query instead of a full download.
+
+    Requires pyarrow (or another Parquet engine that pandas supports).
+
+    Arguments
+    ---------
+
+    root : str, required
+        The directory that holds the store. It's created if it doesn't exist.
+    '''
+    def __init__(self, root):
+        self.root = root
+        self._manifest_path = os.path.join(root, '_manifest.json')
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name_str, tour):
+        return os.path.join(self.root, f"tour={tour.upper()}",
+                            f"player={name_str}", 'matches.parquet')
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {}
+        with open(self._manifest_path) as file:
+            return json.load(file)
+
+    def _record(self, name_str, tour, entry):
+        # rewrite the manifest atomically so readers never see half of it
+        with self._lock:
+            manifest = self._read_manifest()
+            manifest[f"{tour.upper()}/{name_str}"] = entry
+
+            temp = self._manifest_path + f".{threading.get_ident()}.tmp"
+            with open(temp, 'w') as file:
+                json.dump(manifest, file, indent=1)
+            os.replace(temp, self._manifest_path)
+
+    def players(self):
+        '''
+        Return the manifest, a dict that maps each stored player's
+        '<tour>/<name_str>' key to their name, the date of their latest stored
+        match ('last_date'), their number of stored matches ('rows'), and when
+        they were last updated ('updated', in seconds since the epoch).
+        '''
+        with self._lock:
+            return self._read_manifest()
+
+    def last_date(self, name_str, tour):
+        '''
+        Return the date of a player's latest stored match as a Timestamp, or
+        None if the player isn't stored.
+
+        Arguments
+        ---------
+
+        name_str : str, required
+            The player's name as it appears in their page's URL (e.g.,
+            'RogerFederer'), as from NameCheck().name_str.
+
+        tour : str, required
+            The player's tour, 'ATP' or 'WTA'.
+        '''
+        entry = self.players().get(f"{tour.upper()}/{name_str}")
+        return None if entry is None else pd.Timestamp(entry['last_date'])
+
+    def load(self, name_str=None, tour=None):
+        '''
+        Return stored match data. With a `name_str` and `tour`, returns that
+        player's DataFrame (or None if they aren't stored); otherwise, returns
+        every stored match (in one `tour`, if given) with 'tour' and 'player'
+        columns from the partitions.
+
+        Arguments
+        ---------
+
+        name_str : str or None, optional
+            The player's name as it appears in their page's URL. [default: None]
+
+        tour : str or None, optional
+            The tour ('ATP' or 'WTA') to read. [default: None]
+        '''
+        if name_str is not None:
+            if tour is None:
+                raise ValueError('Provide the `tour` of the player to load.')
+            path = self._path(name_str, tour)
+            return pd.read_parquet(path) if os.path.exists(path) else None
+
+        path = (self.root if tour is None
+                else os.path.join(self.root, f"tour={tour.upper()}"))
+        return pd.read_parquet(path)
+
+    def update(self, name, tour, browser='chromium', pool=None,
+               home_url=HOME_URL, wait=None, index=None, full=False,
+               **kwargs):
+        '''
+        Bring a player's stored match data up to date and return it. Downloads
+        the whole career if the player isn't stored yet (or `full` is True);
+        otherwise, only queries the matches since the latest stored date.
+
+        Arguments
+        ---------
+
+        name : str, required
+            The player's name, in any format DownloadStats() accepts.
+
+        tour : str, required
+            The player's tour, 'ATP' or 'WTA'.
+
+        browser, pool, home_url, wait : optional
+            As in DownloadStats().
+
+        index : player_index.PlayerIndex or None, optional
+            The local player index that name lookups check first. If None,
+            uses the shared index. [default: None]
+
+        full : boolean, optional
+            When True, replaces the stored data with a fresh download of the
+            whole career, skipping any cached copy. [default: False]
+
+        **kwargs : optional
+            Passed on to DownloadStats() (e.g., `backend` or `cache`). The
+            stored data is never compacted, so `compact` is not accepted.
+        '''
+        if 'compact' in kwargs:
+            raise TypeError(
+                "update() doesn't accept `compact`, since stored data is "
+                'never compacted. Use DownloadStats.compact_dtypes() on the '
+                'result instead.')
+        if full:
+            kwargs['refresh'] = True
+
+        tour = tour.upper()
+        name_str = resolve_names([name], tour, url=home_url, browser=browser,
+                                 pool=pool, index=index, wait=wait)[name]
+
+        stored = None if full else self.load(name_str, tour)
+        last = None if stored is None else self.last_date(name_str, tour)
+
+        # ask for the whole career, or just the dates since the last update.
+        # the last date is included since the site dates matches by the start
+        # of their tournament, which may still have been underway
+        attrs = {} if last is None else {
+            'start date': last.to_pydatetime(), 'end date': datetime.now()}
+        # (these dates won't repeat, so there's no use caching their codes)
+        url = ConstructURL.__new__(ConstructURL).generate_url(
+            name_str, tour, browser, attrs, pool=pool, home_url=home_url,
+            url_cache=False)
+
+        try:
+            new = DownloadStats(url=url, browser=browser, pool=pool,
+                                wait=wait, **kwargs).match_data
+        except NoMatchesError:
+            if last is None:
+                raise
+            new = None
+
+        if new is None:
+            # not even the last stored date's matches came back, so there's
+            # nothing to swap in; keep the stored data as it is
+            data = stored
+        elif last is None:
+            data = new.reset_index(drop=True)
+        else:
+            # keep the stored columns' types where short windows differ
+            older, new = DownloadStats.align_dtypes(
+                [stored[stored['Date'] < last], new])
+
+            # matches are listed newest first, as on the site
+            data = pd.concat([new, older], ignore_index=True)
+
+        if new is not None:
+            path = self._path(name_str, tour)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # (a leading dot hides the unfinished file from Parquet readers)
+            temp = os.path.join(os.path.dirname(path),
+                                f".matches.{threading.get_ident()}.tmp")
+            data.to_parquet(temp, index=False)
+            os.replace(temp, path)
+
+        self._record(name_str, tour, {
+            'name': ConstructURL.spaced_name_str(name_str),
+            'last_date': f"{data['Date'].max():%Y-%m-%d}",
+            'rows': len(data), 'updated': time.time()})
+
+        return data
+
+    def query(self, name, tour, attrs={}, browser='chromium', pool=None,
+              home_url=HOME_URL, wait=None, index=None, **kwargs):
+        '''
+        Return a player's match data filtered by `attrs`. Answers from the
+        stored career with LocalFilter() when it can reproduce every filter
+        (storing the career first if needed), so repeat queries for a player
+        don't touch the site; otherwise, sends the query to the site with
+        DownloadStats().
+
+        Stored careers are only as current as their last update().
+
+        Arguments
+        ---------
+
+        name, tour, browser, pool, home_url, wait, index, **kwargs : optional
+            As in self.update().
+
+        attrs : dict, optional
+            The query's attributes, as in DownloadStats(). [default: {}]
+        '''
+        tour = tour.upper()
+
+        if not LocalFilter.site_only(attrs):
+            name_str = resolve_names([name], tour, url=home_url,
+                                     browser=browser, pool=pool, index=index,
+                                     wait=wait)[name]
+            career = self.load(name_str, tour)
+            if career is None:
+                career = self.update(name, tour, browser=browser, pool=pool,
+                                     home_url=home_url, wait=wait,
+                                     index=index, **kwargs)
+
+            data = LocalFilter(career, tour).filter(
+                attrs, url=home_url, browser=browser, pool=pool, index=index,
+                wait=wait)
+            if data is not None:
+                return data.reset_index(drop=True)
+
+        return DownloadStats(name, tour, attrs, browser=browser, pool=pool,
+                             home_url=home_url, wait=wait,
+                             **kwargs).match_data
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(root=None):
+    '''
+    Return the shared MatchStore saved at `root`, creating it on first use.
+
+    Arguments
+    ---------
+
+    root : str or None, optional
+        The store's directory. If None, uses 'matches' in
+        execute_query.CACHE_DIR. [default: None]
+    '''
+    root = os.path.join(CACHE_DIR, 'matches') if root is None else root
+    with _STORES_LOCK:
+        if root not in _STORES:
+            _STORES[root] = MatchStore(root)
+    return _STORES[root]
@@ -0,0 +1,89 @@
+import io
+import re
+
+from lxml import etree
+
+# pandas.read_html's whitespace cleanup
+_WHITESPACE = re.compile(r'[\r\n]+|\s{2,}')
+
+def parse_table(html):
+    '''
+    Split the markup of a `#matches` table into its cells in a single
+    streaming pass, without building a DOM for the whole page. Returns a dict
+    in the same format as QueryData(extract='json') -- the 'header' row's
+    cells, a list of the other 'rows' of cells, and whether the table holds a
+    'note' (a <p>, which the site uses to report that no matches were found)
+    instead of data -- or None if `html` is blank.
+
+    The cells' text is cleaned up the way pandas.read_html() does it: runs of
+    whitespace are collapsed, cells spanning several columns are repeated
+    once per column, and hidden (display: none) elements are skipped. A
+    table-less `html` gives empty 'header' and 'rows'.
+
+    Arguments
+    ---------
+
+    html : str, required
+        The table's markup (e.g., an entry of QueryData().html_tables).
+    '''
+    if not html or html.isspace():
+        return None
+
+    # only look for hidden elements if the markup has any styles at all
+    styled = 'style' in html
+
+    header, rows, note = None, [], False
+    tree = etree.iterparse(io.BytesIO(html.encode('utf-8')), events=('end',),
+                           tag=('tr', 'p'), html=True, encoding='utf-8',
+                           no_network=True)
+
+    for _, elem in tree:
+        if elem.tag == 'p':
+            note = True
+            continue
+
+        if not (styled and _is_hidden(elem)):
+            cells = _row_cells(elem, styled)
+
+            # like read_html, treat a <thead> row or a leading row of <th>
+            # cells as the header
+            if header is None and not rows and (
+                    elem.getparent().tag == 'thead'
+                    or all(cl.tag == 'th' for cl in elem)):
+                header = cells
+            else:
+                rows.append(cells)
+
+        # free finished rows so memory use doesn't grow with the table
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    return {'header': header or [], 'rows': rows, 'note': note}
+
+def _row_cells(row, styled):
+    cells = []
+    for cell in row:
+        if cell.tag not in {'td', 'th'}:
+            continue
+        if styled:
+            if _is_hidden(cell):
+                continue
+            _drop_hidden(cell)
+
+        # most cells hold plain text, which skips the slower XPath lookup
+        text = (cell.text or '') if len(cell) == 0 else cell.xpath('string()')
+        text = _WHITESPACE.sub(' ', text.strip())
+
+        span = cell.get('colspan')
+        cells.extend([text] * (int(span) if span and span.isdigit() else 1))
+
+    return cells
+
+def _is_hidden(elem):
+    return 'display:none' in (elem.get('style') or '').replace(' ', '')
+
+def _drop_hidden(cell):
+    # like read_html, remove hidden descendants along with their tails
+    for elem in [el for el in cell.iterdescendants() if _is_hidden(el)]:
+        elem.getparent().remove(elem)
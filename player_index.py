@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import threading
+
+from collections import defaultdict
+
+class PlayerIndex:
+    '''
+    A local, on-disk index of the players that Tennis Abstract's homepage
+    search bar knows about. NameCheck() consults it before opening a browser,
+    so names that have been resolved before (or every name, once the full
+    player list has been loaded) can be matched without touching the site.
+
+    Each player is stored with their name as it appears on the site, their
+    gender ('M' or 'W', as in the site's search suggestions), the slug used in
+    their match data page's URL, and their lowercased name tokens. Lookups go
+    through a trigram index of those tokens, so a name fragment only has to be
+    checked against the handful of players who share its trigrams.
+
+    The index is only treated as authoritative for arbitrary fragments when
+    it's `complete` (i.e., loaded from the site's full player list). Until
+    then, it can only answer queries it has seen resolved before, since a
+    partial index could otherwise pick the only indexed "Williams" when the
+    site would call the name ambiguous.
+
+    Arguments
+    ---------
+
+    path : str or None, optional
+        The JSON file where the index is saved. If the file exists, the index
+        is loaded from it. If None, the index only lives in memory.
+        [default: None]
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.complete = False
+
+        self._players = {} # (gender, name) -> player entry
+        self._grams = defaultdict(set) # trigram -> {(gender, name), ...}
+        self._queries = {} # (gender, sorted fragments) -> name
+        self._lock = threading.RLock()
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._players)
+
+    @staticmethod
+    def _trigrams(token):
+        return {token[i:i+3] for i in range(len(token) - 2)}
+
+    @staticmethod
+    def _query_key(fragments, gender):
+        return gender + '|' + ','.join(sorted(fr.lower() for fr in fragments))
+
+    def add(self, gender, name):
+        '''
+        Add a player to the index if they aren't already in it.
+
+        Arguments
+        ---------
+
+        gender : str, required
+            'M' for ATP players or 'W' for WTA players.
+
+        name : str, required
+            The player's name as it appears on the site (e.g., 'Gael Monfils').
+        '''
+        key = (gender, name)
+        with self._lock:
+            if key in self._players:
+                return
+
+            tokens = name.lower().split()
+            self._players[key] = {'name': name, 'gender': gender,
+                                  'slug': name.replace(' ', ''),
+                                  'tokens': tokens}
+            for tk in tokens:
+                for gram in self._trigrams(tk):
+                    self._grams[gram].add(key)
+
+    def add_labels(self, labels):
+        '''
+        Add players from labels in the search bar's format, where the gender
+        is in parentheses before the name (e.g., '(W) Sabine Lisicki').
+
+        Arguments
+        ---------
+
+        labels : iterable of str, required
+            The labels to parse and add.
+        '''
+        for lb in labels:
+            match = re.match(r'\(([MW])\)\s*(.+)', lb.strip())
+            if match:
+                self.add(match.group(1), match.group(2).strip())
+
+    def record_query(self, fragments, gender, name):
+        '''
+        Remember that a set of name fragments resolved to a single player so
+        the same query can be answered by a partial index later.
+
+        Arguments
+        ---------
+
+        fragments : list of str, required
+            The name fragments that were searched (as in NameCheck().names).
+
+        gender : str, required
+            'M' for ATP players or 'W' for WTA players.
+
+        name : str, required
+            The player's name as it appears on the site.
+        '''
+        with self._lock:
+            self.add(gender, name)
+            self._queries[self._query_key(fragments, gender)] = name
+
+    def lookup(self, fragments, gender):
+        '''
+        Find the players whose names contain every fragment, as the site's
+        search bar would. Returns a set of names (which may be empty or have
+        several entries, just like NameCheck()'s suggestions), or None if the
+        index can't answer the query and the site should be consulted instead.
+
+        Arguments
+        ---------
+
+        fragments : list of str, required
+            The name fragments to search for (as in NameCheck().names).
+
+        gender : str, required
+            'M' for ATP players or 'W' for WTA players.
+        '''
+        with self._lock:
+            known = self._queries.get(self._query_key(fragments, gender))
+            if known is not None:
+                return {known}
+            elif not self.complete:
+                return None
+
+            matches = None
+            for fr in sorted(fragments, key=len, reverse=True):
+                # start with the longest fragment; it usually has the fewest hits
+                found = self._match(fr.lower(), gender, within=matches)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    break
+
+            return {name for _, name in (matches or set())}
+
+    def _match(self, fragment, gender, within=None):
+        '''
+        Return the keys of players of `gender` with a name token containing
+        `fragment`. Narrows the search with the trigram index when the
+        fragment is long enough to have trigrams.
+        '''
+        if within is not None:
+            candidates = within
+        elif len(fragment) >= 3:
+            grams = sorted((self._grams.get(gr, set())
+                            for gr in self._trigrams(fragment)), key=len)
+            candidates = set.intersection(*grams)
+        else:
+            candidates = self._players.keys()
+
+        return {key for key in candidates
+                if key[0] == gender
+                and any(fragment in tk for tk in self._players[key]['tokens'])}
+
+    def replace_all(self, labels):
+        '''
+        Replace the index's contents with the site's full player list and mark
+        the index as complete. Previously resolved queries are kept.
+
+        Arguments
+        ---------
+
+        labels : iterable of str, required
+            Every label from the search bar's data source (e.g., '(M) Roger
+            Federer').
+        '''
+        with self._lock:
+            self._players.clear()
+            self._grams.clear()
+            self.add_labels(labels)
+            self.complete = True
+
+    def load(self):
+        '''
+        Read the index from self.path, rebuilding the trigram index.
+        '''
+        with open(self.path) as file:
+            saved = json.load(file)
+
+        with self._lock:
+            for gender, name in saved.get('players', []):
+                self.add(gender, name)
+            self._queries.update(saved.get('queries', {}))
+            self.complete = saved.get('complete', False)
+
+    def save(self):
+        '''
+        Write the index to self.path (if it has one). The file is replaced in a
+        single step so readers never see a partly written index.
+        '''
+        if self.path is None:
+            return
+
+        with self._lock:
+            saved = {'complete': self.complete,
+                     'players': sorted(self._players),
+                     'queries': self._queries}
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(saved, file)
+            os.replace(temp_path, self.path)
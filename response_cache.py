@@ -0,0 +1,196 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+
+from execute_query import CACHE_DIR
+
+class ResponseCache:
+    '''
+    An on-disk SQLite cache of the raw results of Tennis Abstract queries --
+    the `html_tables` list and `title` that QueryData() or HTTPQueryData()
+    produce -- keyed by the query's normalized URL. Since ConstructURL()
+    generates the same URL for the same name and attributes, repeat queries
+    can skip the site entirely.
+
+    Entries older than `ttl` are treated as missing, and once the cache holds
+    more than `max_bytes` of (compressed) tables, the least recently used
+    entries are evicted.
+
+    Arguments
+    ---------
+
+    path : str, required
+        The SQLite database file. It's created if it doesn't exist.
+
+    ttl : float or None, optional
+        How long (in seconds) an entry stays valid. Entries never expire if
+        None. [default: 604800 (one week)]
+
+    max_bytes : int or None, optional
+        The most compressed table data the cache will hold before evicting
+        entries. No limit if None. [default: 268435456 (256 MB)]
+    '''
+    def __init__(self, path, ttl=7*24*60*60, max_bytes=256*1024**2):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, tables BLOB, title TEXT, size INTEGER, '
+                'created REAL, accessed REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS by_access '
+                         'ON responses (accessed)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # a short-lived connection per call keeps the cache safe to use from
+        # several threads (and processes) at once
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize_url(url):
+        '''
+        Return a canonical version of a query URL so that trivially different
+        spellings of the same query share a cache entry.
+
+        Arguments
+        ---------
+
+        url : str, required
+            The query's URL.
+        '''
+        parts = urllib.parse.urlsplit(url.strip())
+        netloc = parts.netloc.lower()
+        netloc = netloc[:-3] if netloc.endswith(':80') else netloc
+        path = parts.path or '/'
+        query = parts.query.strip('&')
+
+        return urllib.parse.urlunsplit((parts.scheme.lower(), netloc,
+                                        path, query, ''))
+
+    def _key(self, url, backend):
+        return f"{backend}|{self.normalize_url(url)}"
+
+    def get(self, url, backend='browser'):
+        '''
+        Return the cached `(html_tables, title)` for a query, or None if it
+        isn't cached or has expired.
+
+        Arguments
+        ---------
+
+        url : str, required
+            The query's URL.
+
+        backend : str, optional
+            The backend that produced the result ('browser' or 'http'), since
+            each one returns a different set of tables. [default: 'browser']
+        '''
+        key = self._key(url, backend)
+        now = time.time()
+
+        with self._connect() as conn:
+            row = conn.execute('SELECT tables, title, created FROM responses '
+                               'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            tables, title, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+
+            conn.execute('UPDATE responses SET accessed = ? WHERE key = ?',
+                         (now, key))
+
+        return json.loads(zlib.decompress(tables)), title
+
+    def put(self, url, html_tables, title, backend='browser'):
+        '''
+        Save a query's result, then evict the least recently used entries if
+        the cache has grown past `max_bytes`.
+
+        Arguments
+        ---------
+
+        url : str, required
+            The query's URL.
+
+        html_tables : list, required
+            The HTML tables retrieved from the query.
+
+        title : str, required
+            The query's table title.
+
+        backend : str, optional
+            The backend that produced the result. [default: 'browser']
+        '''
+        tables = zlib.compress(json.dumps(html_tables).encode())
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO responses '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         (self._key(url, backend), tables, title,
+                          len(tables), now, now))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        if self.max_bytes is None:
+            return
+
+        total, = conn.execute('SELECT COALESCE(SUM(size), 0) '
+                              'FROM responses').fetchone()
+        if total <= self.max_bytes:
+            return
+
+        # walk from least to most recently used until enough space is freed
+        stale = []
+        for key, size in conn.execute('SELECT key, size FROM responses '
+                                      'ORDER BY accessed').fetchall():
+            stale.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+        conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    def clear(self):
+        '''
+        Remove every entry from the cache.
+        '''
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_cache(path=None):
+    '''
+    Return the shared ResponseCache saved at `path`, creating it on first use.
+
+    Arguments
+    ---------
+
+    path : str or None, optional
+        The cache's SQLite file. If None, uses 'responses.sqlite' in
+        execute_query.CACHE_DIR. [default: None]
+    '''
+    path = os.path.join(CACHE_DIR, 'responses.sqlite') if path is None else path
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = ResponseCache(path)
+    return _CACHES[path]
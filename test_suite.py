@@ -1,7 +1,33 @@
+import asyncio
+import concurrent.futures as cf
+import construct_query
+import execute_query
+import http.server
+import json
+import lxml.html
+import numpy as np
+import os
+import pandas as pd
 import pytest
+import re
+import selenium.common.exceptions as selexcept
+import threading
+import time
 
-from construct_query import DownloadStats
+from benchmarks import fixtures
+from benchmarks.standin_server import StandInServer
+from construct_query import BatchDownloader, ConstructURL, DownloadStats
 from datetime import datetime
+from execute_query import (DriverPool, HTTPPool, HTTPQueryData,
+                           LoadAndInteract, NameCheck, SingleFlight,
+                           WaitPolicy)
+from parse_tables import parse_table
+from local_filter import LocalFilter
+from match_store import MatchStore
+from player_index import PlayerIndex
+from response_cache import ResponseCache
+from tracing import Tracer, get_tracer
+from url_cache import URLCache
 from validate_attrs import ValidateURLAttrs
 
 # expect the entire test to take ~3 minutes to run? (was 1 minute with pyqt)
@@ -319,3 +345,978 @@ def test_full_queries():
         else:
             raise ValueError('Invalid `queries` dict.')
         assert result.title == args['expect'], 'query result mismatch!'
+
+class FakeDriver:
+    # stands in for a WebDriver in tests that don't need a real browser
+    def __init__(self):
+        self.alive = True
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise selexcept.WebDriverException('browser is gone')
+        return 'about:blank'
+
+    def quit(self):
+        self.alive = False
+
+def test_driver_pool(monkeypatch):
+    monkeypatch.setattr(LoadAndInteract, 'choose_browser',
+                        staticmethod(lambda browser, lean=False: FakeDriver()))
+    pool = DriverPool('chromium', size=2, max_uses=2, timeout=.1)
+
+    # returned drivers are reused until they hit `max_uses`
+    first = pool.checkout()
+    pool.checkin(first)
+    assert pool.checkout() is first
+    pool.checkin(first)
+    assert not first.alive
+
+    # the pool never hands out more than `size` drivers at once
+    held = [pool.checkout(), pool.checkout()]
+    with pytest.raises(TimeoutError):
+        pool.checkout()
+
+    # dead drivers are replaced instead of handed out again
+    held[0].quit()
+    pool.checkin(held[0])
+    pool.checkin(held[1])
+    with pool.driver() as driver:
+        assert driver.alive
+
+    pool.close()
+    assert not held[1].alive
+
+def test_name_check_batch_search(monkeypatch):
+    labels = ['(M) Juan Martin Del Potro', '(M) Juan Monaco',
+              '(M) Martin Klizan', '(W) Juan Del Potro']
+
+    class SearchDriver(FakeDriver):
+        # answers the batch search script from `labels`
+        scripts = 0
+
+        def get(self, url):
+            pass
+
+        def find_element(self, by, value):
+            return value
+
+        def execute_script(self, js, fragments):
+            SearchDriver.scripts += 1
+            return [[lb for lb in labels if fr.lower() in lb.lower()]
+                    for fr in fragments]
+
+    monkeypatch.setattr(LoadAndInteract, 'choose_browser',
+                        staticmethod(lambda browser, lean=False: SearchDriver()))
+    pool = DriverPool('chromium', size=1)
+
+    # every fragment is matched in a single script
+    name_obj = NameCheck('juan martin del potro', 'ATP', url='http://stand-in/',
+                         pool=pool)
+    assert name_obj.name_str == 'JuanMartinDelPotro'
+    assert SearchDriver.scripts == 1
+
+    with pytest.raises(ValueError, match='multiple matches'):
+        NameCheck('Juan', 'ATP', url='http://stand-in/', pool=pool)
+
+def test_wait_policy(monkeypatch):
+    policy = WaitPolicy(timeout=.3, timeouts={'toggle': .05}, poll=.01,
+                        backoff=2, retries=1, observe=False)
+    bide = policy.bind(FakeDriver())
+
+    # conditions met after a few checks return quickly and missing elements
+    # just mean "not yet"
+    checks = []
+    def condition(driver):
+        checks.append(time.monotonic())
+        if len(checks) < 4:
+            raise selexcept.NoSuchElementException()
+        return 'ready'
+
+    assert bide.until(condition) == 'ready'
+    gaps = np.diff(checks)
+    assert (gaps[1:] > gaps[:-1]).all() and checks[-1] - checks[0] < .2
+
+    # per-kind timeouts apply
+    start = time.monotonic()
+    with pytest.raises(selexcept.TimeoutException, match='never'):
+        bide.until(lambda driver: False, 'never', name='toggle')
+    assert time.monotonic() - start < .2
+
+    # a timed-out page is reloaded and its interaction repeated
+    class Flaky(LoadAndInteract):
+        attempts = 0
+        def interact(self, driver, bide):
+            Flaky.attempts += 1
+            if Flaky.attempts == 1:
+                raise selexcept.TimeoutException('slow')
+
+    class PageDriver(FakeDriver):
+        def get(self, url):
+            pass
+
+    monkeypatch.setattr(LoadAndInteract, 'choose_browser',
+                        staticmethod(lambda browser, lean=False: PageDriver()))
+    Flaky('http://stand-in/', 'chromium', pool=DriverPool(), wait=policy)
+    assert Flaky.attempts == 2
+
+def test_lean_browser(monkeypatch):
+    class RecordingDriver(FakeDriver):
+        # keeps the options it was launched with
+        def __init__(self, options):
+            super().__init__()
+            self.options = options
+            self.commands = []
+
+        def set_window_size(self, width, height):
+            pass
+
+        def execute_cdp_cmd(self, cmd, cmd_args):
+            self.commands.append(cmd)
+
+    monkeypatch.setattr(execute_query.webdriver, 'Chrome', RecordingDriver)
+
+    # lean and regular browsers come from separate shared pools
+    pool = execute_query.get_pool('chromium', lean=True)
+    assert pool is execute_query.get_pool('chromium', lean=True)
+    assert pool is not execute_query.get_pool('chromium')
+
+    with pool.driver() as driver:
+        caps = driver.options.to_capabilities()
+    pool.close()
+
+    assert caps['pageLoadStrategy'] == 'eager'
+    assert caps['goog:chromeOptions']['prefs'][
+        'profile.managed_default_content_settings.images'] == 2
+    assert 'Network.setBlockedURLs' in driver.commands
+
+def test_batch_downloader(monkeypatch):
+    # fake queries that finish, fail, or run past the timeout based on `name`
+    open_after_timeout, pools = [], []
+    def fake_query(name=None, tour='', browser='chromium', pool=None):
+        pools.append(pool)
+        if name == 'slow':
+            time.sleep(1.5)
+            open_after_timeout.append(not pool.closed)
+        elif name == 'bad':
+            raise ValueError('There were no direct matches.')
+        return name
+
+    monkeypatch.setattr(construct_query, 'DownloadStats', fake_query)
+    specs = [{'name': nm, 'tour': 'ATP'} for nm in ['a', 'bad', 'slow', 'b']]
+    batch = BatchDownloader(specs, workers=2, timeout=.6)
+
+    assert batch.results == ['a', None, None, 'b']
+    assert set(batch.errors) == {1, 2}
+    assert isinstance(batch.errors[1], ValueError)
+    assert isinstance(batch.errors[2], TimeoutError)
+
+    # the pool stays open for the timed-out query, then closes once it ends
+    assert open_after_timeout == []
+    time.sleep(1.5)
+    assert open_after_timeout == [True] and pools[0].closed
+
+    # specs can't replace the batch's own browser or pool
+    with pytest.raises(ValueError, match="Spec 1 sets 'browser'"):
+        BatchDownloader([{'url': 'a'}, {'url': 'b', 'browser': 'firefox'}])
+
+def test_resolve_names(monkeypatch):
+    searched, running, most = [], [], []
+
+    class FakeNameCheck:
+        def __init__(self, name, tour, **kwargs):
+            searched.append(name)
+            running.append(1)
+            most.append(len(running))
+            time.sleep(.05)
+            running.pop()
+            self.name_str = ''.join(wd.capitalize() for wd in
+                                    name.replace('-', ' ').split())
+
+    monkeypatch.setattr(execute_query, 'NameCheck', FakeNameCheck)
+
+    # the main player and all opponents are resolved in one batch, with
+    # duplicates (even in other formats) only searched once
+    attrs = {'head-to-head': ['rafael nadal', 'Rafael-Nadal', 'gael monfils'],
+             'exclude opp': 'Nadal Rafael'}
+    url_obj = ConstructURL('roger federer', 'ATP', attrs=attrs,
+                           pool=DriverPool(size=3))
+    assert sorted(searched) == ['gael monfils', 'rafael nadal',
+                                'roger federer']
+    assert max(most) == 3
+    assert url_obj.URL.endswith('p=RogerFederer&f=ACareerqq'
+                                '&q=RafaelNadal,RafaelNadal,GaelMonfils'
+                                '&x=RafaelNadal')
+
+def test_player_index(tmp_path):
+    labels = ['(M) Jo Wilfried Tsonga', '(M) Gael Monfils',
+              '(W) Venus Williams', '(W) Serena Williams',
+              '(M) Juan Martin Del Potro', '(M) Juan Monaco']
+    path = str(tmp_path / 'players.json')
+
+    # a partial index only answers queries it has seen resolved before
+    index = PlayerIndex(path)
+    index.add_labels(labels)
+    assert index.lookup(['Gael', 'mONf'], 'M') is None
+    index.record_query(['Gael', 'mONf'], 'M', 'Gael Monfils')
+    assert index.lookup(['mONf', 'Gael'], 'M') == {'Gael Monfils'}
+
+    # a complete index matches fragments anywhere in a name, like the site
+    index.replace_all(labels)
+    index.save()
+    index = PlayerIndex(path)
+    assert index.complete and len(index) == len(labels)
+    assert index.lookup(['juan', 'potro'], 'M') == {'Juan Martin Del Potro'}
+    assert index.lookup(['lli'], 'W') == {'Venus Williams', 'Serena Williams'}
+    assert index.lookup(['lli'], 'M') == set()
+
+    # NameCheck resolves names from the index without opening a browser
+    assert NameCheck('jo-wi tsong', 'ATP', index=index).name_str == (
+        'JoWilfriedTsonga')
+    with pytest.raises(ValueError, match='multiple matches'):
+        NameCheck('Williams', 'WTA', index=index)
+    with pytest.raises(ValueError, match='no direct matches'):
+        NameCheck('Sab Lisi', 'WTA', index=index)
+
+def test_http_query_data():
+    head = "<thead><tr><th>Date</th><th></th><th>Score</th>%s</tr></thead>"
+    rows = ("<tr><td>2-Jan</td><td>d. Rafael Nadal [ESP]</td><td>6-4 7-6(5)"
+            "</td><td>%s</td></tr><tr><td>1-Jan</td><td>Andy Murray [GBR] d."
+            "</td><td>6-3 7-6(2)</td><td>%s</td></tr>")
+    views = ["<table id='matches'>" + head % f"<th>{col}</th>"
+             + rows % (col, col) + '</table>' for col in ['DR', 'TPW', 'Pts']]
+    page = ("<html><body><div id='tablelabel'>Matches (1-1) &gt; <b>Time "
+            "Span:</b> Career</div><div id='holder'>" + views[0] + '</div>'
+            '<script>var views = ' + json.dumps(views).replace('</', '<\\/')
+            + ';</script></body></html>').encode()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/cgi-bin/player-classic.cgi"
+
+    try:
+        http_pool = HTTPPool()
+        for _ in range(2): # the second request reuses the open connection
+            query = HTTPQueryData(url, 'ATP', http_pool=http_pool)
+            assert query.title == 'Matches (1-1) > Time Span: Career'
+
+            # every embedded view is read, with loss scores reversed
+            assert [tab['header'][-1] for tab in query.html_tables] == [
+                'DR', 'TPW', 'Pts']
+            assert [row[2] for row in query.html_tables[2]['rows']] == [
+                '6-4 7-6(5)', '3-6 6-7(2)']
+        assert len(http_pool._idle[('http', url.split('/')[2])]) == 1
+
+        # a WTA page has two views, not three
+        with pytest.raises(ValueError, match='Expected 2 stat views'):
+            HTTPQueryData(url, 'WTA', http_pool=http_pool)
+    finally:
+        http_pool.close()
+        server.shutdown()
+
+    # pages that don't embed their views only pass along blank results
+    table = ("<table id='matches'><tr><td><table><tr><td>nested</td></tr>"
+             "</table></td></tr></table>")
+    query = HTTPQueryData.__new__(HTTPQueryData)
+    query.tour = 'ATP'
+    assert query._find_element(f"<body>{table}</body>", 'table',
+                               'matches') == table
+    assert query.search_tables('<body></body>') == ['']
+    with pytest.raises(ValueError, match="doesn't embed its stat views"):
+        query.search_tables(f"<body>{table}</body>")
+
+def test_backends_agree():
+    pool = DriverPool('chromium', size=1)
+    try:
+        with pool.driver():
+            pass
+    except selexcept.WebDriverException as e:
+        pool.close()
+        pytest.skip(f"comparing backends needs a browser: {e.msg}")
+
+    # clicking through the stand-in's views (and reversing its loss scores)
+    # gives the same frame as reading them from the page source
+    try:
+        with StandInServer(n_matches=40) as server:
+            for page in ['player-classic.cgi?p=RogerFederer',
+                         'wplayer-classic.cgi?p=SerenaWilliams']:
+                url = server.home_url + 'cgi-bin/' + page + '&f=ACareerqq'
+                http = DownloadStats(url=url, backend='http', cache=False)
+                assert (http.match_data['Won'] == 0).any()
+
+                for extract in ['html', 'json']:
+                    browser = DownloadStats(url=url, pool=pool, cache=False,
+                                            extract=extract)
+                    assert browser.title == http.title
+                    pd.testing.assert_frame_equal(browser.match_data,
+                                                  http.match_data)
+    finally:
+        pool.close()
+
+def test_standin_server():
+    with StandInServer(n_matches=40) as server:
+        # URLs built for the stand-in point at it instead of the real site
+        url = ConstructURL.generate_url(
+            ValidateURLAttrs(), 'RogerFederer', 'ATP', 'chromium',
+            attrs={'start date': datetime(1995, 1, 1),
+                   'end date': datetime(1995, 2, 1)},
+            home_url=server.home_url)
+        assert url.startswith(server.home_url + 'cgi-bin/player-classic.cgi')
+
+        full = DownloadStats(url=(server.home_url + 'cgi-bin/player-classic.'
+                                  'cgi?p=RogerFederer&f=ACareerqq'),
+                             backend='http', cache=False)
+        part = DownloadStats(url=url, backend='http', cache=False)
+
+    assert full.match_data.shape[0] == 40
+    assert 0 < part.match_data.shape[0] < 40
+    assert (part.match_data['Date'] <= datetime(1995, 2, 1)).all()
+
+    # recorded pages are replayed for the same player and filters only
+    recorded = {'fed': {'url': ('https://www.tennisabstract.com/cgi-bin/'
+                                'player-classic.cgi?p=RogerFederer'
+                                '&f=ACareerqq'),
+                        'page': '<html><body>recorded</body></html>'}}
+    with StandInServer(n_matches=40, recordings=recorded) as server:
+        pool = execute_query.get_http_pool()
+        page = (server.home_url + 'cgi-bin/player-classic.cgi?'
+                'p=RogerFederer&f=ACareerqq')
+        assert pool.get(page) == recorded['fed']['page']
+        assert pool.get(page + 'x') != recorded['fed']['page']
+        assert pool.get(page.replace('player-', 'wplayer-')) != (
+            recorded['fed']['page'])
+
+def test_async_api(tmp_path):
+    # records the threads that read from the cache
+    class ThreadCache(ResponseCache):
+        def get(self, url, backend='browser'):
+            readers.append(threading.get_ident())
+            return super().get(url, backend)
+
+    readers = []
+    cache = ThreadCache(str(tmp_path / 'responses.sqlite'))
+
+    with StandInServer(n_matches=40) as server:
+        url = (server.home_url
+               + 'cgi-bin/player-classic.cgi?p=RogerFederer&f=ACareerqq')
+
+        async def fetch_cached():
+            await DownloadStats.fetch(url=url, backend='http', cache=cache)
+            await DownloadStats.fetch(url=url, backend='http', cache=cache)
+            return threading.get_ident()
+
+        # the cache's SQLite file is read outside of the event loop
+        loop_thread = asyncio.run(fetch_cached())
+        assert len(readers) == 2 and loop_thread not in readers
+
+        async def fetch_many():
+            return await asyncio.gather(*[
+                DownloadStats.fetch(url=url, backend='http', cache=False)
+                for _ in range(5)])
+
+        results = asyncio.run(fetch_many())
+        expected = DownloadStats(url=url, backend='http', cache=False)
+
+    for res in results:
+        assert res.title == expected.title
+        pd.testing.assert_frame_equal(res.match_data, expected.match_data)
+
+    # names known to the index resolve without a browser
+    index = PlayerIndex()
+    index.record_query(['Roger', 'Federer'], 'M', 'Roger Federer')
+    name_obj = asyncio.run(NameCheck.resolve('Roger Federer', 'ATP',
+                                             index=index))
+    assert name_obj.name_str == 'RogerFederer'
+
+    # blocking calls dispatched through a pool never exceed its size
+    running, most = [], []
+    def blocking():
+        running.append(1)
+        most.append(len(running))
+        time.sleep(.05)
+        running.pop()
+
+    async def run_many(pool):
+        await asyncio.gather(*[pool.run_in_thread(blocking)
+                               for _ in range(6)])
+
+    asyncio.run(run_many(DriverPool(size=2)))
+    assert max(most) <= 2
+
+def test_response_cache(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), max_bytes=None)
+    url = ("http://www.TennisAbstract.com:80/cgi-bin/player-classic.cgi?"
+           "p=JamesBlake&f=ACareerqqC2&")
+
+    assert cache.get(url) is None
+    cache.put(url, ['<table id="matches"></table>'], 'Matches (1-3)')
+    assert cache.get(url.replace('TennisAbstract.com:80', 'tennisabstract.com')
+                        .rstrip('&')) == (
+        ['<table id="matches"></table>'], 'Matches (1-3)')
+    assert cache.get(url, backend='http') is None
+
+    # expired entries are treated as missing
+    cache.ttl = 0
+    time.sleep(.01)
+    assert cache.get(url) is None
+
+    # the least recently used entries are evicted first once over max_bytes
+    cache.ttl, cache.max_bytes = None, 200
+    for i in range(3):
+        cache.put(f"{url}{i}", [os.urandom(40).hex()], '') # ~90 bytes each
+        time.sleep(.01)
+        cache.get(f"{url}0")
+    assert cache.get(f"{url}0") is not None
+    assert cache.get(f"{url}1") is None
+    assert cache.get(f"{url}2") is not None
+
+    # queries only use the shared cache when asked to
+    shared = ResponseCache(str(tmp_path / 'shared.sqlite'))
+    monkeypatch.setattr(construct_query, 'get_cache', lambda: shared)
+    with StandInServer(n_matches=10) as server:
+        page = (server.home_url + 'cgi-bin/player-classic.cgi?'
+                'p=JamesBlake&f=ACareerqq')
+        DownloadStats(url=page, backend='http')
+        assert shared.get(page, backend='http') is None
+        DownloadStats(url=page, backend='http', cache=True)
+        assert shared.get(page, backend='http') is not None
+
+def make_view(stat_cols, stat_rows):
+    # builds a small #matches table like the ones on a player data page
+    cols = ['Date', 'Tournament', 'Surface', 'Rd', 'Rk', 'vRk', '', 'Score']
+    rows = [['02‑Jul‑2019', 'Wimbledon', 'Grass', 'R64', '13', '42',
+             'd. Gael Monfils [FRA]', '6-4 7-6(2)'],
+            ['29‑May‑2019', 'Roland Garros', 'Clay', 'R128', '13', '7',
+             '(7)Juan Monaco [ARG] d.', '6-2 6-1']]
+    cols += stat_cols
+
+    html = ('<thead><tr>' + ''.join(f"<th>{c}</th>" for c in cols)
+            + '</tr></thead>')
+    for row, stats in zip(rows, stat_rows):
+        html += '<tr>' + ''.join(f"<td>{v}</td>" for v in row + stats) + '</tr>'
+    html += f"<tr><td colspan='{len(cols)}'><a href='#'>more</a></td></tr>"
+    return f"<table id='matches'>{html}</table>"
+
+def test_merge_and_edit_tables():
+    tables = [make_view(['A%', '1stIn', 'BPSvd'],
+                        [['8.1%', '61.0%', '66.7% (4/6)'],
+                         ['-', '104.0%', '- (0/0)']]),
+              make_view(['RPW', 'BPCnv'],
+                        [['41.5%', '33.3% (2/6)'], ['30.0%', '0.0% (0/3)']])]
+    data = DownloadStats.merge_and_edit_tables(tables)
+
+    assert list(data.columns) == [
+        'Date', 'Tournament', 'Surface', 'Rd', 'Rk', 'vRk', 'Result', 'Won',
+        'Score', 'A%', '1stIn%', 'Brkn', 'BPFaced', 'RPW%', 'Brks', 'BPForced']
+    assert list(data['Won']) == [1, 0]
+    assert list(data['Date']) == [pd.Timestamp(2019, 7, 2),
+                                  pd.Timestamp(2019, 5, 29)]
+    assert data['1stIn%'].iloc[0] == 61. and np.isnan(data['1stIn%'].iloc[1])
+    assert np.isnan(data['A%'].iloc[1])
+    assert list(data['Brkn']) == [2, pd.NA] and list(data['Brks']) == [2, 0]
+    assert list(data['BPForced']) == [6, 3]
+
+    # results without both 'd.' and a country code can't be read as a win
+    # or a loss
+    for bad in ['Gael Monfils [FRA]', 'd. Gael Monfils']:
+        broken = [tab.replace('d. Gael Monfils [FRA]', bad) for tab in tables]
+        with pytest.raises(ValueError, match='Unexpected .Result. string'):
+            DownloadStats.merge_and_edit_tables(broken)
+
+def table_cells(html):
+    # splits a table into the dict that QueryData(extract='json') returns
+    rows = [[' '.join(td.text_content().split())
+             for td in tr.xpath('./th|./td')
+             for _ in range(int(td.get('colspan', 1)))]
+            for tr in lxml.html.fromstring(html).xpath('.//tr')]
+    return {'header': rows[0], 'rows': rows[1:], 'note': False}
+
+def test_merge_extracted_tables():
+    for tour in ['ATP', 'WTA']:
+        tables = fixtures.make_fixture('small', tour)['html_tables']
+        pd.testing.assert_frame_equal(
+            DownloadStats.merge_and_edit_tables(tables),
+            DownloadStats.merge_and_edit_tables(
+                [table_cells(tab) for tab in tables]))
+
+    with pytest.raises(ValueError, match='no matches'):
+        DownloadStats.merge_and_edit_tables(
+            [{'header': [], 'rows': [['No matches.']], 'note': True}])
+
+def test_recorded_fixtures():
+    # pages saved from the live site with fixtures.record_fixture() must
+    # still format into the match data they gave when they were recorded
+    recorded = fixtures.load_recorded()
+    if not recorded:
+        pytest.skip('no recorded fixtures in benchmarks/fixtures/')
+
+    for name, fx in recorded.items():
+        data = DownloadStats.merge_and_edit_tables(fx['html_tables'])
+        assert fixtures.frame_digest(data) == fx['expected'], name
+
+def test_parse_table():
+    # cells should match what pd.read_html() finds, hidden elements and all
+    tables = fixtures.make_fixture('small', 'ATP')['html_tables'] + [
+        '<table><thead><tr><th colspan="2">A</th><th>B</th></tr></thead>'
+        '<tr><td>1 <span style="display: none">x</span>y</td>'
+        '<td style="display:none">2</td><td>3<b>4</b></td><td>5</td></tr>'
+        '<tr style="display:none"><td>6</td></tr></table>']
+    for tab in tables:
+        pd.testing.assert_frame_equal(
+            construct_query._table_to_frame(parse_table(tab)),
+            pd.read_html(tab).pop())
+
+    assert parse_table(' \n') is None
+    assert parse_table('<div>Oops</div>') == {'header': [], 'rows': [],
+                                              'note': False}
+    assert parse_table("<table id='matches'><tr><td><p>No matches found."
+                       "</p></td></tr></table>")['note']
+
+    with pytest.raises(ValueError, match='blank page'):
+        DownloadStats.merge_and_edit_tables([''])
+    with pytest.raises(ValueError, match='Unexpected result'):
+        DownloadStats.merge_and_edit_tables(['<div>Oops</div>'])
+
+def test_merge_repeated_matches():
+    # identical rows (e.g., a match listed twice) should survive the merge once
+    # each, and views that list different matches should be caught
+    matches = fixtures.make_matches(5)
+    matches.append(matches[-1])
+    tables = [fixtures.make_table(matches, cols)
+              for cols in fixtures.VIEW_COLS['ATP']]
+    assert len(DownloadStats.merge_and_edit_tables(tables)) == 6
+
+    tables[1] = fixtures.make_table(matches[::-1], fixtures.VIEW_COLS['ATP'][1])
+    with pytest.raises(ValueError, match="don't list the same matches"):
+        DownloadStats.merge_and_edit_tables(tables)
+
+def test_compact_dtypes():
+    tables = fixtures.make_fixture('career', 'ATP')['html_tables']
+    stats = DownloadStats.__new__(DownloadStats)
+    stats._settle(*stats._finish(tables, 'title', False, 'http'), compact=True)
+
+    data = DownloadStats.merge_and_edit_tables(tables)
+    compact = stats.match_data
+    assert compact.memory_usage(deep=True).sum() < (
+        data.memory_usage(deep=True).sum() / 4)
+
+    assert compact['Surface'].dtype == 'category'
+    assert compact['Won'].dtype == 'Int8' and compact['Brks'].dtype == 'Int8'
+    assert compact['Aces'].dtype == 'Int8' and compact['vRk'].dtype == 'Int16'
+    assert compact['A%'].dtype == np.float32
+
+    # values shouldn't change beyond float32 rounding
+    assert (compact['Tournament'].astype(object) == data['Tournament']).all()
+    assert (compact['Brkn'] == data['Brkn']).all()
+    assert np.allclose(compact['RPW%'], data['RPW%'], equal_nan=True)
+
+def test_match_store(tmp_path):
+    # (a broken pyarrow, e.g. one built for another numpy, also skips)
+    pytest.importorskip('pyarrow', exc_type=ImportError)
+    store = MatchStore(str(tmp_path / 'store'))
+    index = PlayerIndex()
+    index.record_query(['Roger', 'Federer'], 'M', 'Roger Federer')
+    index.record_query(['Serena', 'Williams'], 'W', 'Serena Williams')
+    kwargs = {'index': index, 'backend': 'http', 'cache': False}
+
+    with StandInServer(n_matches=40) as server:
+        first = store.update('Roger Federer', 'ATP',
+                             home_url=server.home_url, **kwargs)
+        assert len(first) == 40
+        last = store.last_date('RogerFederer', 'ATP')
+        assert last == first['Date'].max()
+
+        # newer matches arrive; only the dates since the last one are queried
+        server.n_matches = 50
+        server._pages.clear()
+        requested = []
+        real_page = server.player_page
+        server.player_page = lambda *args: (requested.append(args[-1])
+                                            or real_page(*args))
+
+        data = store.update('Roger Federer', 'ATP',
+                            home_url=server.home_url, **kwargs)
+        assert len(requested) == 1 and 'Acx' in requested[0]
+
+        expected = DownloadStats(url=(server.home_url + 'cgi-bin/player-'
+                                      'classic.cgi?p=RogerFederer&f=ACareerqq'),
+                                 backend='http', cache=False).match_data
+
+    pd.testing.assert_frame_equal(data, expected.reset_index(drop=True),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(store.load('RogerFederer', 'ATP'), data,
+                                  check_dtype=False)
+    assert store.players()['ATP/RogerFederer']['rows'] == 50
+
+    # filtered queries are answered from the stored career
+    clay = store.query('Roger Federer', 'ATP', {'surface': 'clay'}, **kwargs)
+    assert len(clay) == (data['Surface'] == 'Clay').sum()
+    assert set(store.load(tour='ATP')['player']) == {'RogerFederer'}
+
+    # a full update skips the cached copy of the career
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+    cached = {**kwargs, 'cache': cache}
+    with StandInServer(n_matches=30) as server:
+        requested = []
+        real_page = server.player_page
+        server.player_page = lambda *args: (requested.append(args[-1])
+                                            or real_page(*args))
+        store.update('Serena Williams', 'WTA', home_url=server.home_url,
+                     **cached)
+        store.update('Serena Williams', 'WTA', home_url=server.home_url,
+                     full=True, **cached)
+        assert requested == ['ACareerqq'] * 2
+
+        # if nothing comes back, the stored matches are all kept
+        server.player_page = lambda name, tour, filters: real_page(
+            name, tour, 'Acx2100010121000102qq')
+        kept = store.update('Serena Williams', 'WTA',
+                            home_url=server.home_url, **kwargs)
+        assert len(kept) == len(store.load('SerenaWilliams', 'WTA')) == 30
+
+    with pytest.raises(TypeError, match='compact'):
+        store.update('Serena Williams', 'WTA', compact=True, **kwargs)
+
+    # every stored player can be read at once
+    both = store.load()
+    assert len(both) == 50 + 30
+    assert set(zip(both['tour'], both['player'])) == {
+        ('ATP', 'RogerFederer'), ('WTA', 'SerenaWilliams')}
+
+def test_local_filter():
+    with StandInServer(n_matches=200) as server:
+        page = server.home_url + 'cgi-bin/player-classic.cgi?p=RogerFederer'
+        career = DownloadStats(url=page + '&f=ACareerqq', backend='http',
+                               cache=False).match_data
+        window = DownloadStats(url=page + '&f=Acx1995020119950501qq',
+                               backend='http', cache=False).match_data
+
+    local = LocalFilter(career, 'ATP')
+
+    # dates give the same rows as the site
+    dated = local.filter({'start date': datetime(1995, 5, 1),
+                          'end date': datetime(1995, 2, 1)})
+    pd.testing.assert_frame_equal(dated.reset_index(drop=True), window,
+                                  check_dtype=False)
+
+    # other filters match the columns they describe
+    both = local.filter({'surface': ['clay', 'grass'],
+                         'head-to-head': 'Gael Monfils',
+                         'round': 'F'}, resolved={'Gael Monfils': 'GaelMonfils'})
+    assert len(both) > 0
+    assert set(both['Surface']) <= {'Clay', 'Grass'} and set(both['Rd']) == {'F'}
+    assert both['Result'].str.contains('Gael Monfils').all()
+
+    seeded = local.filter({'vs entry': 'seeded', 'vs rank': 'Top 50'})
+    assert seeded['Result'].str.contains(r'\(\d+\)').all()
+    assert (seeded['vRk'].astype(int) <= 50).all()
+
+    # the stand-in's match winners take every set, 7-6 in the second one, so
+    # (with loss scores reversed) a player's wins read '6-x 7-6(y)' and their
+    # losses read 'x-6 6-7(y)'
+    wins, losses = career['Won'] == 1, career['Won'] == 0
+    first_set = career['Score'].str.split().str[0]
+    expected = {'won 7-6': wins, 'lost 7-6': losses,
+                'won 6-0': wins & (first_set == '6-0'),
+                'lost 6-0': losses & (first_set == '0-6'),
+                'all 6-0': first_set.isin(['6-0', '0-6'])}
+
+    for value, rows in expected.items():
+        found = local.filter({'score': value})
+        assert 0 < len(found) < len(career)
+        assert list(found.index) == list(career.index[rows])
+
+    # filters the match data can't reproduce are left to the site
+    assert local.filter({'vs hand': 'left'}) is None
+    assert local.filter({'round': 'First Match'}) is None
+    with pytest.raises(ValueError, match='Invalid value'):
+        local.filter({'surface': 'sand'})
+
+def test_single_flight(tmp_path):
+    # identical calls in flight at once share one result (or error)
+    flight = SingleFlight()
+    calls = []
+    def slow(value):
+        calls.append(value)
+        time.sleep(.2)
+        if value is None:
+            raise ValueError('no value')
+        return value
+
+    def run_together(value, n=4):
+        results = []
+        def target():
+            try:
+                results.append(flight.run('key', slow, value))
+            except ValueError as e:
+                results.append(e)
+        threads = [threading.Thread(target=target) for _ in range(n)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        return results
+
+    assert run_together(5) == [5] * 4 and calls == [5]
+    assert all(isinstance(res, ValueError) for res in run_together(None))
+    assert len(calls) == 2 and flight.shared == 6
+
+    with StandInServer(n_matches=40) as server:
+        # count (slowed-down) requests for the player's page
+        requests = []
+        real_page = server.player_page
+        def player_page(*args):
+            requests.append(args)
+            time.sleep(.2)
+            return real_page(*args)
+        server.player_page = player_page
+        url = (server.home_url
+               + 'cgi-bin/player-classic.cgi?p=RogerFederer&f=ACareerqq')
+
+        # concurrent queries in one process make one request
+        with cf.ThreadPoolExecutor(4) as executor:
+            stats = list(executor.map(
+                lambda _: DownloadStats(url=url, backend='http', cache=False,
+                                        flight=flight), range(4)))
+        assert len(requests) == 1
+        for st in stats[1:]:
+            pd.testing.assert_frame_equal(st.match_data, stats[0].match_data)
+        assert stats[0].match_data is not stats[1].match_data
+
+        async def fetch_many():
+            return await asyncio.gather(*[
+                DownloadStats.fetch(url=url, backend='http', cache=False,
+                                    flight=flight) for _ in range(3)])
+        asyncio.run(fetch_many())
+        assert len(requests) == 2
+
+        # with a lock directory, queries that don't share a SingleFlight (as
+        # in separate processes) wait for each other and read the cache
+        cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+        lock_dir = str(tmp_path / 'locks')
+        with cf.ThreadPoolExecutor(2) as executor:
+            stats = list(executor.map(
+                lambda _: DownloadStats(url=url, backend='http', cache=cache,
+                                        flight=SingleFlight(lock_dir)),
+                range(2)))
+        assert len(requests) == 3
+        assert sorted(st.from_cache for st in stats) == [False, True]
+
+def test_attr_specs():
+    val = ValidateURLAttrs()
+
+    # every key's values are encoded from its lookup tables, in order
+    attrs = {'vs rank': (1, 20), 'surface': ['Clay', 'grass'],
+             'head-to-head': 'Gael Monfils', 'score': 'won 7-6',
+             'start date': datetime(2010, 1, 1),
+             'end date': datetime(2009, 1, 1)}
+    assert (val.encode(attrs, 'ATP', {'Gael Monfils': 'GaelMonfils'})
+            == '&f=Acx2009010120100101qqIcx1000110020qqB1i2Q1&q=GaelMonfils')
+
+    # the same value can have different codes on each tour
+    assert val.encode({'event': 'us open', 'vs rank': 'Top 5'}, 'WTA') == (
+        '&f=ACareerqqDUS_OpenqqIcx1000110005qq')
+    assert val.encode({'sets': 'best of 3 sets'}, 'WTA') == '&f=ACareerqqP0i1'
+
+    with pytest.raises(ValueError, match="'Masters' level"):
+        val.encode({'level': 'masters'}, 'WTA')
+    with pytest.raises(ValueError, match='only available for ATP'):
+        val.encode({'sets': '3 of 5 sets'}, 'WTA')
+    with pytest.raises(ValueError, match='Invalid value type'):
+        val.encode({'vs hand': ['left', 'right']}, 'ATP')
+    with pytest.raises(KeyError):
+        val.encode({'bogus': 'clay'}, 'ATP')
+
+def test_url_cache(monkeypatch):
+    searched = []
+
+    def fake_resolve(names, tour, **kwargs):
+        searched.extend(names)
+        return {nm: ''.join(wd.capitalize() for wd in nm.split())
+                for nm in names}
+
+    monkeypatch.setattr(construct_query, 'resolve_names', fake_resolve)
+    cache = URLCache(maxsize=2)
+
+    # equivalent attrs share an entry, and opponents aren't looked up again
+    first = ConstructURL('roger federer', 'ATP', url_cache=cache,
+                         attrs={'surface': ['clay', 'grass', 'clay'],
+                                'head-to-head': 'rafael nadal'})
+    again = ConstructURL('roger federer', 'atp', url_cache=cache,
+                         attrs={'head-to-head': 'Rafael Nadal',
+                                'surface': ['Grass', 'clay']})
+    assert first.URL == again.URL and first.URL.endswith(
+        'p=RogerFederer&f=ACareerqqB1i2&q=RafaelNadal')
+    assert searched == ['roger federer', 'rafael nadal', 'roger federer']
+    assert cache.info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2}
+
+    # the least recently used entry is evicted, and errors aren't stored
+    for attrs in [{'round': 'F'}, {'surface': 'clay'}]:
+        ConstructURL('roger federer', 'ATP', attrs=attrs, url_cache=cache)
+    with pytest.raises(ValueError):
+        ConstructURL('roger federer', 'ATP', attrs={'surface': 'sand'},
+                     url_cache=cache)
+    assert cache.key({'round': 'F'}, 'ATP', execute_query.HOME_URL) in cache
+    assert (cache.key({'surface': ['clay', 'grass']}, 'ATP',
+                      execute_query.HOME_URL) not in cache)
+    assert cache.info()['size'] == 2
+
+    # values without a canonical form are encoded every time
+    assert cache.key({'vs rank': {'top': 5}}, 'ATP', 'x') is None
+
+def test_sweep(monkeypatch):
+    batches = []
+
+    def fake_resolve(names, tour, **kwargs):
+        batches.append(list(names))
+        return {nm: ''.join(wd.capitalize() for wd in nm.split())
+                for nm in names}
+
+    monkeypatch.setattr(construct_query, 'resolve_names', fake_resolve)
+
+    sweep = ConstructURL.sweep(
+        ['roger federer', 'andy murray'], 'atp',
+        grid={'surface': ['clay', ['grass', 'hard']],
+              'head-to-head': ['rafael nadal', 'novak djokovic']},
+        windows=[2008, (datetime(2012, 1, 1), datetime(2012, 6, 30))],
+        url_cache=URLCache())
+    assert batches == [] # nothing runs until the first URL is requested
+
+    pairs = list(sweep)
+    assert len(pairs) == 2 * 2 * 2 * 2
+    assert len(batches) == 1 and len(batches[0]) == 4
+
+    spec, url = pairs[1]
+    assert spec == {'name': 'roger federer', 'tour': 'ATP',
+                    'attrs': {'start date': datetime(2008, 1, 1),
+                              'end date': datetime(2008, 12, 31),
+                              'surface': 'clay',
+                              'head-to-head': 'novak djokovic'}}
+    assert url.endswith('p=RogerFederer&f=Acx2008010120081231qqB1'
+                        '&q=NovakDjokovic')
+    assert pairs[-1][1].endswith('p=AndyMurray&f=Acx2012010120120630qqB2i0'
+                                 '&q=NovakDjokovic')
+
+    # a bad value fails before any URLs are built
+    with pytest.raises(ValueError, match="key 'surface'"):
+        next(ConstructURL.sweep(['roger federer'], 'ATP',
+                                grid={'surface': ['clay', 'sand']}))
+
+def test_chunked_download(monkeypatch, tmp_path):
+    with StandInServer(n_matches=300) as server:
+        page = server.home_url + 'cgi-bin/player-classic.cgi?p=RogerFederer'
+
+        # year windows add up to the single query, in the same order
+        for query in ['&f=ACareerqq', '&f=Acx1995060119960301qqB1']:
+            whole = DownloadStats(url=page + query, backend='http',
+                                  cache=False)
+            parts = DownloadStats(url=page + query, backend='http',
+                                  cache=False, chunk=True)
+            assert parts.title == whole.title
+            pd.testing.assert_frame_equal(parts.match_data, whole.match_data)
+
+        with pytest.raises(construct_query.NoMatchesError):
+            DownloadStats(url=page + '&f=Acx2001010120041231qq',
+                          backend='http', cache=False, chunk=2)
+        with pytest.raises(ValueError, match='date windows'):
+            DownloadStats(url=page + '&f=B1', backend='http', cache=False,
+                          chunk=True)
+
+    # a break of more than `workers` years doesn't cut the career short
+    real_matches = fixtures.make_matches
+    def comeback(n_matches, seed=0):
+        matches = real_matches(n_matches, seed)
+        for mt in matches[n_matches // 2:]: # (the older half)
+            mt['Date'] = mt['Date'][:-4] + str(int(mt['Date'][-4:]) - 8)
+        return matches
+    monkeypatch.setattr(fixtures, 'make_matches', comeback)
+
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+    with StandInServer(n_matches=300) as server:
+        requested = []
+        real_page = server.player_page
+        server.player_page = lambda *args: (requested.append(args[-1])
+                                            or real_page(*args))
+
+        page = server.home_url + 'cgi-bin/player-classic.cgi?p=RogerFederer'
+        whole = DownloadStats(url=page, backend='http', cache=False)
+        years = set(whole.match_data['Date'].dt.year)
+        assert min(years) < 1990 and not years & set(range(1990, 1994))
+
+        # three rounds of four one-year windows (from this year, 1996, and
+        # 1988), each followed by a query for the years before it, instead
+        # of a window for every year since 1968
+        requested.clear()
+        parts = DownloadStats(url=page, backend='http', cache=cache,
+                              chunk=True)
+        assert len(requested) == 3 * 4 + 3
+        assert parts.title == whole.title
+        pd.testing.assert_frame_equal(parts.match_data, whole.match_data)
+
+        # empty windows are cached along with the rest
+        requested.clear()
+        again = DownloadStats(url=page, backend='http', cache=cache,
+                              chunk=True)
+        assert requested == [] and again.from_cache
+
+        # titles without a record are left as they are
+        server.player_page = lambda *args: re.sub(
+            r'Matches \(\d+-\d+\) ', 'Matches ', real_page(*args))
+        whole = DownloadStats(url=page, backend='http', cache=False)
+        parts = DownloadStats(url=page, backend='http', cache=False,
+                              chunk=True)
+        assert parts.title == whole.title == 'Matches > Time Span: Career'
+
+    # windows' columns are joined with matching dtypes
+    a = pd.DataFrame({'Aces': pd.array([3, None], dtype='Int64'),
+                      'Time': [np.nan, np.nan], 'DR': [1.5, .8]})
+    b = pd.DataFrame({'Aces': [2.5, 1.], 'Time': ['1:22', '2:05'],
+                      'DR': [1.1, .9]})
+    c = pd.DataFrame({'Aces': pd.array([4], dtype='Int64'), 'Time': ['3:01'],
+                      'DR': [2.]})
+    aligned = DownloadStats.align_dtypes([a, b, c])
+    assert [fr['Aces'].dtype for fr in aligned] == [np.float64] * 3
+    assert [fr['Time'].dtype for fr in aligned] == [object] * 3
+    assert [fr['DR'].dtype for fr in aligned] == [np.float64] * 3
+
+def test_tracing():
+    finished = []
+    get_tracer().add_hook(finished.append)
+    try:
+        with StandInServer(n_matches=40) as server:
+            url = server.home_url + 'cgi-bin/player-classic.cgi?p=RogerFederer'
+            stats = DownloadStats(url=url, backend='http', cache=False)
+    finally:
+        get_tracer().remove_hook(finished.append)
+
+    # the query's stages nest under the span saved on the instance
+    span = stats.timings
+    assert finished == [span]
+    assert span.name == 'DownloadStats' and span.attrs['url'] == url
+    assert [sp.name for sp in span.children] == ['HTTPQueryData',
+                                                 'merge_and_edit_tables']
+    assert span.find('http get') and span.find('parse_table')
+    assert span.duration >= sum(sp.duration for sp in span.children)
+
+    # errors are recorded, and failing hooks only warn
+    def broken(span):
+        raise RuntimeError('oops')
+
+    tracer = Tracer(hooks=[broken, finished.append])
+    with pytest.warns(UserWarning, match='timing hook failed'):
+        with pytest.raises(KeyError):
+            with tracer.span('outer', tour='ATP'):
+                with tracer.span('inner'):
+                    raise KeyError
+    assert finished[-1].attrs == {'tour': 'ATP', 'error': 'KeyError'}
+    assert finished[-1].find('inner')[0].attrs == {'error': 'KeyError'}
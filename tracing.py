@@ -0,0 +1,233 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+import warnings
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError: # optional; only needed for otel_hook()
+    otel_trace = None
+
+# the span that new spans nest under in the current thread or task. worker
+# threads only see it if they run in a copy of the caller's context (as with
+# asyncio.to_thread() or contextvars.copy_context().run())
+_CURRENT = contextvars.ContextVar('span', default=None)
+
+# converts monotonic clock readings to wall-clock time for exporters
+_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+class Span:
+    '''
+    The timing of one stage of a query: its `name`, its `attrs` (e.g., the
+    URL or tour involved), its `start` and `end` on the monotonic clock (in
+    seconds), and the spans of the stages nested inside it (`children`).
+    Made by Tracer.span().
+    '''
+    def __init__(self, name, attrs, parent=None):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+        self.start = time.monotonic()
+        self.end = None
+
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def duration(self):
+        '''
+        How long the stage took, in seconds (so far, if it's still running).
+        '''
+        return (time.monotonic() if self.end is None else self.end) - self.start
+
+    @property
+    def self_time(self):
+        '''
+        How much of the stage's duration wasn't spent in its children.
+        '''
+        return self.duration - sum(ch.duration for ch in self.children)
+
+    def walk(self, depth=0):
+        '''
+        Yield `(depth, span)` for this span and every span nested inside it,
+        in order.
+        '''
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def find(self, name):
+        '''
+        Return every span named `name` in this span's tree, in order.
+
+        Arguments
+        ---------
+
+        name : str, required
+            The stage's name.
+        '''
+        return [sp for _, sp in self.walk() if sp.name == name]
+
+    def to_dict(self):
+        '''
+        Return the span's tree as nested dicts (e.g., for JSON).
+        '''
+        return {'name': self.name, 'attrs': dict(self.attrs),
+                'start': self.start, 'duration': self.duration,
+                'children': [ch.to_dict() for ch in self.children]}
+
+    def __str__(self):
+        attrs = ', '.join(f"{key}={val}" for key, val in self.attrs.items())
+        return (f"{self.name}: {self.duration:.3f} s"
+                + (f" ({attrs})" if attrs else ''))
+
+    def __repr__(self):
+        return f"<Span {self}>"
+
+class Tracer:
+    '''
+    Times the stages of the query pipeline. Stages are recorded with
+    self.span(), which nests each span under the one that's open in the
+    calling thread (or asyncio task). Once an outermost span finishes, its
+    whole tree is passed to every hook.
+
+    Arguments
+    ---------
+
+    hooks : list of callables, optional
+        Functions that receive each finished outermost Span (e.g., from
+        logging_hook() or otel_hook(), or any callback). A hook that raises
+        only triggers a warning. [default: []]
+    '''
+    def __init__(self, hooks=[]):
+        self.hooks = list(hooks)
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        '''
+        Start passing finished spans to `hook`.
+        '''
+        with self._lock:
+            self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        '''
+        Stop passing finished spans to `hook`.
+        '''
+        with self._lock:
+            self.hooks = [hk for hk in self.hooks if hk != hook]
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        '''
+        Time the body of a `with` block as a stage called `name`, yielding
+        its Span so more `attrs` can be added along the way. If the block
+        raises, the exception's type is saved under the 'error' attribute.
+
+        Arguments
+        ---------
+
+        name : str, required
+            The stage's name.
+
+        **attrs : optional
+            Details about the stage (e.g., `url` or `tour`).
+        '''
+        parent = _CURRENT.get()
+        span = Span(name, attrs, parent)
+        token = _CURRENT.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            span.end = time.monotonic()
+            _CURRENT.reset(token)
+            if parent is None:
+                self._emit(span)
+
+    def _emit(self, span):
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as e:
+                warnings.warn(f"A timing hook failed: {e!r}")
+
+def current_span():
+    '''
+    Return the innermost span that's open in the calling thread (or asyncio
+    task), or None.
+    '''
+    return _CURRENT.get()
+
+def logging_hook(logger=None, level=logging.INFO):
+    '''
+    Return a hook that logs every span in a finished tree, one line each and
+    indented by depth.
+
+    Arguments
+    ---------
+
+    logger : logging.Logger or None, optional
+        Where to log. If None, uses this module's logger. [default: None]
+
+    level : int, optional
+        The level of the log records. [default: logging.INFO]
+    '''
+    logger = logging.getLogger(__name__) if logger is None else logger
+
+    def log(span):
+        for depth, sp in span.walk():
+            logger.log(level, '%s%s', '  ' * depth, sp)
+
+    return log
+
+def otel_hook(tracer=None):
+    '''
+    Return a hook that replays each finished tree as OpenTelemetry spans
+    (with the same names, attributes, timestamps, and nesting), so they reach
+    whatever exporter the OpenTelemetry SDK is set up with. Needs the
+    opentelemetry-api package.
+
+    Arguments
+    ---------
+
+    tracer : opentelemetry.trace.Tracer or None, optional
+        The tracer that creates the spans. If None, uses the global tracer
+        provider's tracer for this module. [default: None]
+    '''
+    if otel_trace is None:
+        raise ValueError('Exporting spans to OpenTelemetry needs the '
+                         'opentelemetry-api package.')
+    tracer = otel_trace.get_tracer(__name__) if tracer is None else tracer
+
+    def export(span, parent=None):
+        context = (None if parent is None
+                   else otel_trace.set_span_in_context(parent))
+        # (OpenTelemetry attributes must be primitive values)
+        attrs = {key: val for key, val in span.attrs.items()
+                 if isinstance(val, (str, bool, int, float))}
+
+        otel_span = tracer.start_span(span.name, context=context,
+                                      attributes=attrs,
+                                      start_time=_epoch_ns(span.start))
+        for child in span.children:
+            export(child, otel_span)
+        otel_span.end(end_time=_epoch_ns(span.end))
+
+    return export
+
+def _epoch_ns(monotonic):
+    return int(monotonic * 1e9) + _EPOCH_OFFSET_NS
+
+_TRACER = Tracer()
+
+def get_tracer():
+    '''
+    Return the Tracer shared by every stage of the query pipeline.
+    '''
+    return _TRACER
@@ -0,0 +1,175 @@
+import collections
+import datetime
+import threading
+
+class URLCache:
+    '''
+    A bounded, in-memory, least-recently-used cache of encoded query strings
+    (the part of a query's URL that ValidateURLAttrs._validate_attrs()
+    builds from `attrs`). Since the same filter combinations are requested
+    over and over, ConstructURL().generate_url() checks it before validating
+    and encoding `attrs` again -- and before resolving any 'head-to-head' or
+    'exclude opp' names in them.
+
+    Entries are keyed by the tour, the site, and a canonical form of `attrs`
+    (see self.key()), so dicts that only differ in key order, the case of
+    their values, or the order of (or repeats in) their lists share one.
+    Only successfully encoded `attrs` are stored.
+
+    Arguments
+    ---------
+
+    maxsize : int, optional
+        The most entries the cache will hold before evicting the least
+        recently used one. [default: 1024]
+    '''
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def canonical(attrs):
+        '''
+        Return a hashable version of `attrs` with sorted keys, lowercased
+        string values, sorted and deduplicated lists, and dates as ISO
+        strings -- or None if some value can't be represented that way.
+
+        Arguments
+        ---------
+
+        attrs : dict, required
+            The attributes, as in ConstructURL().
+        '''
+        try:
+            return tuple(sorted((key, _value_key(val))
+                                for key, val in attrs.items()))
+        except TypeError: # unhashable or unsortable values
+            return None
+
+    @staticmethod
+    def distinct(attrs):
+        '''
+        Return a copy of `attrs` without repeated entries in its lists
+        (ignoring case; the first of each is kept), so that it encodes the same
+        way as every other dict with its canonical form.
+
+        Arguments
+        ---------
+
+        attrs : dict, required
+            The attributes, as in ConstructURL(). Their canonical form should
+            exist.
+        '''
+        def dedupe(vals):
+            seen = {}
+            for vl in vals:
+                seen.setdefault(_value_key(vl), vl)
+            return list(seen.values())
+
+        return {key: dedupe(val) if type(val) == list else val
+                for key, val in attrs.items()}
+
+    def key(self, attrs, tour, home_url):
+        '''
+        Return the cache key for `attrs` in a query for a player on `tour` at
+        the site at `home_url`, or None if `attrs` can't be cached.
+
+        Arguments
+        ---------
+
+        attrs : dict, required
+            The attributes, as in ConstructURL().
+
+        tour : str, required
+            The player's tour, 'ATP' or 'WTA'.
+
+        home_url : str, required
+            The homepage of the site being queried.
+        '''
+        canon = self.canonical(attrs)
+        return None if canon is None else (home_url, tour.upper(), canon)
+
+    def __contains__(self, key):
+        # (doesn't count as a hit or miss, or refresh the entry)
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        '''
+        Return the encoded query string saved under `key`, or None if there
+        isn't one.
+
+        Arguments
+        ---------
+
+        key : tuple, required
+            A key from self.key().
+        '''
+        with self._lock:
+            code = self._entries.get(key)
+            if code is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return code
+
+    def put(self, key, code):
+        '''
+        Save an encoded query string under `key`, evicting the least recently
+        used entry if the cache is full.
+
+        Arguments
+        ---------
+
+        key : tuple, required
+            A key from self.key().
+
+        code : str, required
+            The encoded query string.
+        '''
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        '''
+        Return a dict with the cache's 'hits', 'misses', current number of
+        entries ('size'), and 'maxsize'.
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        '''
+        Remove every entry from the cache and reset its counters.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+def _value_key(val):
+    if type(val) == str:
+        return val.lower()
+    elif isinstance(val, datetime.date): # (also covers pandas.Timestamp)
+        return ('date', val.isoformat())
+    elif type(val) == list:
+        return ('list', tuple(sorted({_value_key(vl) for vl in val})))
+    elif type(val) in {tuple, int, float}:
+        # (tuples, like 'vs rank' ranges, keep their order)
+        return (type(val).__name__, val)
+    raise TypeError
+
+_URL_CACHE = URLCache()
+
+def get_url_cache():
+    '''
+    Return the URLCache shared by every ConstructURL instance.
+    '''
+    return _URL_CACHE